@@ -0,0 +1,166 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as redis
+
+from metrics import registry
+
+USER_INVALIDATION_CHANNEL = "users:invalidate"
+SESSION_REVOCATION_CHANNEL = "sessions:revoked"
+
+# Блокировка снимается, только если ее значение совпадает с токеном владельца:
+# после истечения ttl ее может взять другой процесс
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LocalCache:
+    """
+    Ограниченный по размеру и времени жизни кэш в памяти процесса
+
+    При переполнении вытесняется давно не использованная запись
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl = ttl
+
+        self._hits = registry.counter(f"{name}_hits_total")
+        self._misses = registry.counter(f"{name}_misses_total")
+        self._evictions = registry.counter(f"{name}_evictions_total")
+        registry.callback(f"{name}_size", lambda: len(self._data))
+
+    def get(self, key: str) -> Any | None:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self._misses.inc()
+            return None
+
+        self._data.move_to_end(key)
+        self._hits.inc()
+        return item[1]
+
+    def set(self, key: str, value: Any, ttl: float | None = None):
+        expires_at = time.monotonic() + (self._ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self._evictions.inc()
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные загрузки одного ключа в одну
+
+    Все ожидающие получают результат единственной загрузки. Если задан lock_ttl_ms,
+    загрузку между процессами дополнительно ограничивает короткая блокировка в Редис:
+    не получившие ее процессы ждут, пока значение появится в кэше
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_con: redis.Redis,
+        lock_ttl_ms: int = 0,
+        lock_poll_interval: float = 0.02,
+    ):
+        self._calls: dict[str, asyncio.Task] = {}
+        self._redis = redis_con
+        self._lock_ttl_ms = lock_ttl_ms
+        self._lock_poll_interval = lock_poll_interval
+        self._release = redis_con.register_script(_RELEASE_SCRIPT)
+
+        self._loads = registry.counter(f"{name}_loads_total")
+        self._shared = registry.counter(f"{name}_shared_total")
+        self._lock_waits = registry.counter(f"{name}_lock_waits_total")
+
+    async def do(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[Any]],
+        recheck: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, load, recheck))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self._shared.inc()
+
+        return await asyncio.shield(task)
+
+    async def _load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[Any]],
+        recheck: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        if not self._lock_ttl_ms:
+            self._loads.inc()
+            return await load()
+
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        if not await self._redis.set(lock_key, token, nx=True, px=self._lock_ttl_ms):
+            self._lock_waits.inc()
+            deadline = time.monotonic() + self._lock_ttl_ms / 1000
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self._lock_poll_interval)
+                value = await recheck()
+                if value is not None:
+                    return value
+
+            self._loads.inc()
+            return await load()
+
+        try:
+            self._loads.inc()
+            return await load()
+        finally:
+            await self._release(keys=[lock_key], args=[token])
+
+
+async def publish_invalidation(redis_con: redis.Redis, channel: str, key: str):
+    await redis_con.publish(channel, key)
+
+
+async def listen_invalidations(redis_con: redis.Redis, channel: str, cache: LocalCache):
+    """
+    Удаляет из локального кэша ключи, опубликованные в канал другими процессами
+
+    Сообщения pub/sub не гарантируют доставку, поэтому после переподключения
+    локальный кэш очищается целиком
+    """
+
+    while True:
+        try:
+            async with redis_con.pubsub() as pubsub:
+                await pubsub.subscribe(channel)
+                cache.clear()
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        cache.delete(message["data"].decode())
+        except redis.RedisError:
+            cache.clear()
+            await asyncio.sleep(1)
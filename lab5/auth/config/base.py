@@ -1,5 +1,10 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Предел asyncpg на количество параметров одного запроса и параметры одного пользователя
+MAX_QUERY_PARAMS = 32767
+USER_INSERT_PARAMS = 5
+
 
 # ENV settings
 class Settings(BaseSettings):
@@ -18,6 +23,38 @@ class Settings(BaseSettings):
     """Порт БД Редис"""
     redis_password: str
     """Пароль БД Редис"""
+    redis_max_connections: int = 50
+    """Максимальное количество подключений в пуле Редис"""
+    redis_pool_timeout: float = 5.0
+    """Время ожидания свободного подключения из пула, в секундах"""
+    redis_health_check_interval: int = 30
+    """Интервал проверки простаивающих подключений Редис, в секундах"""
+    redis_socket_timeout: float = 5.0
+    """Таймаут операций с сокетом Редис, в секундах"""
+    redis_socket_connect_timeout: float = 2.0
+    """Таймаут установки подключения к Редис, в секундах"""
+
+    user_cache_local_size: int = 10000
+    """Максимальное количество пользователей в локальном кэше процесса"""
+    user_cache_local_ttl: float = 30.0
+    """Время жизни пользователя в локальном кэше процесса, в секундах"""
+    user_loader_lock_ttl_ms: int = 0
+    """Время жизни блокировки загрузки пользователя из БД между процессами, 0 - отключена"""
+
+    user_directory_build_chunk_size: int = 5000
+    """Количество пользователей, читаемых из БД за раз при построении справочника"""
+    user_directory_build_lock_ttl: int = 300
+    """Время жизни блокировки построения справочника пользователей, в секундах"""
+
+    user_search_cache_size: int = 1000
+    """Максимальное количество результатов поиска пользователей в кэше процесса"""
+    user_search_cache_ttl: float = 5.0
+    """Время жизни результата поиска пользователей в кэше процесса, в секундах"""
+
+    user_bulk_batch_size: int = Field(
+        default=100, ge=1, le=MAX_QUERY_PARAMS // USER_INSERT_PARAMS
+    )
+    """Количество пользователей, создаваемых одним запросом в БД и отдаваемых в ответ за раз при массовом создании"""
 
     db_port: int
     """Порт БД"""
@@ -32,5 +69,23 @@ class Settings(BaseSettings):
 
     postgres_dsn: str
     """Адрес БД"""
+    db_pool_size: int = 10
+    """Количество постоянных подключений в пуле БД"""
+    db_max_overflow: int = 10
+    """Количество подключений сверх пула при пиковой нагрузке"""
+    db_pool_pre_ping: bool = True
+    """Проверять подключение перед выдачей из пула"""
+
+    jwt_keys_dir: str = "keys"
+    """Каталог с ключами подписи токенов"""
+    jwt_keys_reload_interval: float = 60.0
+    """Интервал проверки каталога ключей на новые ключи, в секундах"""
+
+    password_hash_workers: int = 2
+    """Количество процессов для хеширования паролей"""
+    password_hash_queue_size: int = 64
+    """Максимальное количество задач хеширования в очереди"""
+    password_hash_bulk_workers: int | None = None
+    """Количество процессов для хеширования паролей массового создания, по умолчанию как password_hash_workers"""
 
 settings = Settings(_env_file=".env")  # type: ignore
\ No newline at end of file
@@ -1,7 +1,3 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from config import settings
+from sqlalchemy.orm import declarative_base
 
-engine = create_engine(settings.postgres_dsn)
-get_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
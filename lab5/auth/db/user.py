@@ -9,11 +9,15 @@ class UserModel(Base):
     username = Column(String(100), unique=True, nullable=False)
     password = Column(Text, nullable=False)
     is_admin = Column(Boolean)
+    first_name = Column(String(100))
+    last_name = Column(String(100))
 
     def to_dict(self) -> dict:
         return {
             'id': self.id,
             'username': self.username,
             'is_admin': self.is_admin,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
             'password': self.password
         }
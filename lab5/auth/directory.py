@@ -0,0 +1,218 @@
+import asyncio
+import json
+import uuid
+from contextlib import suppress
+
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db.user import UserModel
+from metrics import registry
+
+DIRECTORY_KEY = "users:directory"
+DIRECTORY_DATA_KEY = "users:directory:data"
+DIRECTORY_BUILD_KEY = "users:directory:build"
+DIRECTORY_BUILD_DATA_KEY = "users:directory:build:data"
+DIRECTORY_BUILD_TOUCHED_KEY = "users:directory:build:touched"
+DIRECTORY_LOCK_KEY = "lock:users:directory"
+
+# Логины хранятся в сортированном множестве с одинаковым весом и упорядочены
+# побайтово, данные пользователей - в хеше. Пока идет перестроение, изменения
+# дублируются во временные ключи, чтобы не потерять их при переименовании,
+# а логин отмечается как измененный: более старый снимок БД его не перезапишет
+_WRITE_SCRIPT = """
+local op = ARGV[1]
+local function apply(zset, hash)
+    if op == 'add' then
+        redis.call('ZADD', zset, 0, ARGV[2])
+        redis.call('HSET', hash, ARGV[2], ARGV[3])
+    else
+        redis.call('ZREM', zset, ARGV[2])
+        redis.call('HDEL', hash, ARGV[2])
+    end
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    apply(KEYS[1], KEYS[2])
+end
+if redis.call('EXISTS', KEYS[5]) == 1 then
+    apply(KEYS[3], KEYS[4])
+    redis.call('SADD', KEYS[6], ARGV[2])
+end
+"""
+
+# Пачка снимка БД: логины, измененные во время перестроения, пропускаются
+_BUILD_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call('SISMEMBER', KEYS[3], ARGV[i]) == 0 then
+        redis.call('ZADD', KEYS[1], 0, ARGV[i])
+        redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+    end
+end
+"""
+
+# Готовый справочник подменяет текущий, только пока блокировка у этого процесса
+_FINISH_SCRIPT = """
+if redis.call('GET', KEYS[5]) ~= ARGV[1] or redis.call('EXISTS', KEYS[3]) == 0 then
+    return 0
+end
+redis.call('RENAME', KEYS[3], KEYS[1])
+redis.call('RENAME', KEYS[4], KEYS[2])
+redis.call('DEL', KEYS[6], KEYS[5])
+return 1
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_PAGE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local names = redis.call('ZRANGE', KEYS[1], ARGV[1], '+', 'BYLEX', 'LIMIT', 0, ARGV[2])
+if #names == 0 then
+    return {}
+end
+return redis.call('HMGET', KEYS[2], unpack(names))
+"""
+
+
+def _dump(user) -> str:
+    return json.dumps(
+        {
+            "username": user.username,
+            "is_admin": bool(user.is_admin),
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+        }
+    )
+
+
+class UserDirectory:
+    """
+    Кэш списка пользователей в Редис с постраничным доступом по логину
+
+    Справочник строится один раз в фоне и затем обновляется точечно
+    при создании и удалении пользователей
+    """
+
+    def __init__(
+        self,
+        redis_con: redis.Redis,
+        session_maker: async_sessionmaker[AsyncSession],
+        build_chunk_size: int,
+        build_lock_ttl: int,
+    ):
+        self._redis = redis_con
+        self._session_maker = session_maker
+        self._build_chunk_size = build_chunk_size
+        self._build_lock_ttl = build_lock_ttl
+        self._build_task: asyncio.Task | None = None
+
+        self._write = redis_con.register_script(_WRITE_SCRIPT)
+        self._page = redis_con.register_script(_PAGE_SCRIPT)
+        self._build_chunk = redis_con.register_script(_BUILD_SCRIPT)
+        self._finish = redis_con.register_script(_FINISH_SCRIPT)
+        self._release = redis_con.register_script(_RELEASE_SCRIPT)
+
+        self._hits = registry.counter("user_directory_hits_total")
+        self._misses = registry.counter("user_directory_misses_total")
+
+    async def page(self, after: str | None, limit: int) -> list[str] | None:
+        """
+        Возвращает страницу пользователей в виде JSON строк,
+        None - если справочник еще не построен
+        """
+        start = f"({after}" if after else "-"
+        items = await self._page(
+            keys=[DIRECTORY_KEY, DIRECTORY_DATA_KEY], args=[start, limit]
+        )
+        if items is None:
+            self._misses.inc()
+            await self.ensure_built()
+            return None
+
+        self._hits.inc()
+        return items
+
+    async def add(self, user: UserModel, client: redis.Redis | None = None):
+        await self._write(
+            keys=self._write_keys(),
+            args=["add", user.username, _dump(user)],
+            client=client,
+        )
+
+    async def remove(self, username: str):
+        await self._write(keys=self._write_keys(), args=["remove", username])
+
+    def _write_keys(self) -> list[str]:
+        return [
+            DIRECTORY_KEY,
+            DIRECTORY_DATA_KEY,
+            DIRECTORY_BUILD_KEY,
+            DIRECTORY_BUILD_DATA_KEY,
+            DIRECTORY_LOCK_KEY,
+            DIRECTORY_BUILD_TOUCHED_KEY,
+        ]
+
+    async def ensure_built(self):
+        """
+        Запускает фоновое построение справочника, если его не строит другой процесс
+        """
+        if self._build_task is not None and not self._build_task.done():
+            return
+        token = uuid.uuid4().hex
+        if not await self._redis.set(
+            DIRECTORY_LOCK_KEY, token, nx=True, ex=self._build_lock_ttl
+        ):
+            return
+
+        self._build_task = asyncio.create_task(self._build(token))
+
+    async def _build(self, token: str):
+        try:
+            await self._redis.delete(
+                DIRECTORY_BUILD_KEY,
+                DIRECTORY_BUILD_DATA_KEY,
+                DIRECTORY_BUILD_TOUCHED_KEY,
+            )
+
+            built = 0
+            async with self._session_maker() as con:
+                result = await con.stream(
+                    select(
+                        UserModel.username,
+                        UserModel.is_admin,
+                        UserModel.first_name,
+                        UserModel.last_name,
+                    ).execution_options(yield_per=self._build_chunk_size)
+                )
+                async for rows in result.partitions():
+                    await self._build_chunk(
+                        keys=[
+                            DIRECTORY_BUILD_KEY,
+                            DIRECTORY_BUILD_DATA_KEY,
+                            DIRECTORY_BUILD_TOUCHED_KEY,
+                        ],
+                        args=[
+                            value
+                            for row in rows
+                            for value in (row.username, _dump(row))
+                        ],
+                    )
+                    built += len(rows)
+
+            if built:
+                await self._finish(keys=self._write_keys(), args=[token])
+        finally:
+            await self._release(keys=[DIRECTORY_LOCK_KEY], args=[token])
+
+    async def close(self):
+        if self._build_task is not None:
+            self._build_task.cancel()
+            with suppress(Exception, asyncio.CancelledError):
+                await self._build_task
@@ -0,0 +1,90 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+from metrics import registry
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def verify_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def get_password_hash(password):
+    return pwd_context.hash(password)
+
+
+class HasherBusyError(Exception):
+    """
+    Очередь задач хеширования переполнена
+    """
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt в отдельном пуле процессов, не блокируя event loop
+
+    Количество ожидающих и выполняющихся задач ограничено queue_size,
+    при переполнении очереди выбрасывается HasherBusyError. Массовое хеширование
+    идет параллельно в отдельном пуле из bulk_workers процессов, поэтому проверка
+    паролей при входе не встает в очередь за целой пачкой
+    """
+
+    def __init__(self, workers: int, queue_size: int, bulk_workers: int):
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        self._bulk_executor = ProcessPoolExecutor(
+            max_workers=bulk_workers, mp_context=context
+        )
+        self._queue_size = queue_size
+        self._pending = 0
+
+        self._queue_depth = registry.gauge("password_hasher_queue_depth")
+        self._rejected = registry.counter("password_hasher_rejected_total")
+        self._latency = registry.latency("password_hasher_latency_seconds")
+
+    async def _run(self, func, *args):
+        if self._pending >= self._queue_size:
+            self._rejected.inc()
+            raise HasherBusyError
+
+        self._pending += 1
+        self._queue_depth.set(self._pending)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._latency.observe(time.perf_counter() - started)
+            self._pending -= 1
+            self._queue_depth.set(self._pending)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        """
+        Хеширует пароли пачки параллельно в пуле массового хеширования
+        """
+        loop = asyncio.get_running_loop()
+        return list(
+            await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        self._bulk_executor, get_password_hash, password
+                    )
+                    for password in passwords
+                )
+            )
+        )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._bulk_executor.shutdown(wait=True, cancel_futures=True)
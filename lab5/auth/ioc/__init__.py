@@ -7,5 +7,9 @@ from . import providers
 container = make_async_container(
     providers.AppProvider(),
     providers.RedisProvider(),
+    providers.DatabaseProvider(),
+    providers.KeyProvider(),
+    providers.HasherProvider(),
+    providers.CacheProvider(),
     context={config.Settings: config.settings},
 )
@@ -1,9 +1,29 @@
+import asyncio
+from contextlib import suppress
 from typing import Annotated, AsyncIterator
 
 import redis.asyncio as redis
 from dishka import FromComponent, Provider, Scope, from_context, provide
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 import config
+from directory import UserDirectory
+from keys import KeyStore
+from search import UserSearchCache
+from cache import (
+    USER_INVALIDATION_CHANNEL,
+    LocalCache,
+    SingleFlight,
+    listen_invalidations,
+)
+from metrics import registry
+from hashing import PasswordHasher
 
 SERVICE_TOKEN = "ServiceToken"
 
@@ -14,6 +34,95 @@ class AppProvider(Provider):
     settings = from_context(provides=config.Settings, scope=Scope.APP)
 
 
+class KeyProvider(Provider):
+    component = "KeyProvider"
+
+    @provide(scope=Scope.APP)
+    def get_key_store(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+    ) -> KeyStore:
+        """
+        Провайдер, поставляющий ключи подписи токенов
+        Используется извне
+        """
+
+        return KeyStore(settings.jwt_keys_dir, settings.jwt_keys_reload_interval)
+
+
+class DatabaseProvider(Provider):
+    component = "DatabaseProvider"
+
+    @provide(scope=Scope.APP)
+    async def _init_engine(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+    ) -> AsyncIterator[AsyncEngine]:
+        """
+        Провайдер, поставляющий асинхронный движок PostgreSQL на asyncpg
+        Является зависимостью для получения сессии и не предназначен для вызова извне
+        """
+
+        engine = create_async_engine(
+            make_url(settings.postgres_dsn).set(drivername="postgresql+asyncpg"),
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+
+        yield engine
+
+        await engine.dispose()
+
+    @provide(scope=Scope.APP)
+    def _init_session_maker(
+        self, engine: AsyncEngine
+    ) -> async_sessionmaker[AsyncSession]:
+        """
+        Провайдер, поставляющий фабрику сессий
+        Не предназначен для вызова извне
+        """
+
+        return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    @provide(scope=Scope.REQUEST)
+    async def get_session(
+        self, session_maker: async_sessionmaker[AsyncSession]
+    ) -> AsyncIterator[AsyncSession]:
+        """
+        Провайдер, поставляющий сессию БД на время запроса
+        Используется извне
+        """
+
+        async with session_maker() as session:
+            yield session
+
+
+class HasherProvider(Provider):
+    component = "HasherProvider"
+
+    @provide(scope=Scope.APP)
+    async def get_password_hasher(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+    ) -> AsyncIterator[PasswordHasher]:
+        """
+        Провайдер, поставляющий пул процессов для хеширования паролей
+        Используется извне
+        """
+
+        hasher = PasswordHasher(
+            workers=settings.password_hash_workers,
+            queue_size=settings.password_hash_queue_size,
+            bulk_workers=settings.password_hash_bulk_workers
+            or settings.password_hash_workers,
+        )
+
+        yield hasher
+
+        hasher.shutdown()
+
+
 class RedisProvider(Provider):
     component = "RedisProvider"
 
@@ -27,31 +136,131 @@ class RedisProvider(Provider):
         Является зависимостью для получения устройства доступа и не предназначен для вызова извне
         """
 
-        redis_pool = redis.ConnectionPool.from_url(
-            f"rediss://:{settings.redis_password}@{settings.redis_host}:{settings.redis_port}",
+        redis_pool = redis.BlockingConnectionPool.from_url(
+            f"redis://:{settings.redis_password}@{settings.redis_host}:{settings.redis_port}",
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            health_check_interval=settings.redis_health_check_interval,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout,
+        )
+
+        registry.callback(
+            "redis_pool_in_use", lambda: len(redis_pool._in_use_connections)
         )
+        registry.callback(
+            "redis_pool_available", lambda: len(redis_pool._available_connections)
+        )
+        registry.callback("redis_pool_max", lambda: redis_pool.max_connections)
 
         yield redis_pool
 
         await redis_pool.aclose()
 
-    @provide(scope=Scope.REQUEST)
+    @provide(scope=Scope.APP)
     async def get_redis_client(
         self,
         redis_pool: redis.ConnectionPool,
-        settings: Annotated[config.Settings, FromComponent("AppProvider")],
     ) -> AsyncIterator[redis.Redis]:
         """
-        Провайдер, поставляющий устройства доступа для обращения в БД Редис
+        Провайдер, поставляющий устройство доступа для обращения в БД Редис
+        Устройство общее для всего приложения и берет подключения из пула
         Используется извне
         """
 
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-        )
+        redis_client = redis.Redis(connection_pool=redis_pool)
 
         yield redis_client
 
         await redis_client.aclose()
+
+
+class CacheProvider(Provider):
+    component = "CacheProvider"
+
+    @provide(scope=Scope.APP)
+    async def get_user_cache(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        redis_client: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    ) -> AsyncIterator[LocalCache]:
+        """
+        Провайдер, поставляющий локальный кэш пользователей процесса
+        Кэш сбрасывается по сообщениям из канала инвалидации Редис
+        Используется извне
+        """
+
+        user_cache = LocalCache(
+            "user_cache_local",
+            maxsize=settings.user_cache_local_size,
+            ttl=settings.user_cache_local_ttl,
+        )
+        listener = asyncio.create_task(
+            listen_invalidations(redis_client, USER_INVALIDATION_CHANNEL, user_cache)
+        )
+
+        yield user_cache
+
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+
+    @provide(scope=Scope.APP)
+    def get_user_loader(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        redis_client: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    ) -> SingleFlight:
+        """
+        Провайдер, поставляющий объединитель загрузок пользователей из БД
+        Используется извне
+        """
+
+        return SingleFlight(
+            "user_loader",
+            redis_client,
+            lock_ttl_ms=settings.user_loader_lock_ttl_ms,
+        )
+
+    @provide(scope=Scope.APP)
+    async def get_user_directory(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        redis_client: Annotated[redis.Redis, FromComponent("RedisProvider")],
+        session_maker: Annotated[
+            async_sessionmaker[AsyncSession], FromComponent("DatabaseProvider")
+        ],
+    ) -> AsyncIterator[UserDirectory]:
+        """
+        Провайдер, поставляющий справочник пользователей в Редис
+        Используется извне
+        """
+
+        user_directory = UserDirectory(
+            redis_client,
+            session_maker,
+            build_chunk_size=settings.user_directory_build_chunk_size,
+            build_lock_ttl=settings.user_directory_build_lock_ttl,
+        )
+
+        yield user_directory
+
+        await user_directory.close()
+
+    @provide(scope=Scope.APP)
+    def get_user_search_cache(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+    ) -> UserSearchCache:
+        """
+        Провайдер, поставляющий кэш результатов поиска пользователей
+        Используется извне
+        """
+
+        return UserSearchCache(
+            LocalCache(
+                "user_search_cache",
+                maxsize=settings.user_search_cache_size,
+                ttl=settings.user_search_cache_ttl,
+            )
+        )
@@ -0,0 +1,122 @@
+import os
+import time
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+    Ed25519PrivateKey,
+    Ed25519PublicKey,
+)
+from jwt.algorithms import OKPAlgorithm
+from jwt.exceptions import InvalidTokenError
+
+ALGORITHM = "EdDSA"
+
+
+class KeyStore:
+    """
+    Ключи подписи токенов Ed25519
+
+    Ключи лежат в каталоге keys_dir в виде PEM файлов, имя файла - идентификатор
+    ключа (kid). Подписывает последний по имени ключ, проверяются и публикуются
+    в JWKS все. Для ротации в каталог кладется новый ключ, старый удаляется после
+    истечения выданных им токенов. Если каталог пуст, ключ создается автоматически
+    """
+
+    def __init__(self, keys_dir: str, reload_interval: float):
+        self._keys_dir = Path(keys_dir)
+        self._reload_interval = reload_interval
+        self._reload_at = 0.0
+        self._state = None
+
+        self._private_keys: dict[str, Ed25519PrivateKey] = {}
+        self._public_keys: dict[str, Ed25519PublicKey] = {}
+        self._active_kid = ""
+        self._jwks: dict = {"keys": []}
+
+    def _generate(self):
+        """
+        Создает ключ, доступный только владельцу (0600)
+
+        Ключ пишется во временный файл и появляется под своим именем через
+        link, который не перезаписывает существующий файл. Если несколько процессов
+        одновременно создают ключ с одним kid, остается первый, и все читают его
+        """
+        self._keys_dir.mkdir(parents=True, exist_ok=True)
+        key = Ed25519PrivateKey.generate()
+        path = self._keys_dir / f"{int(time.time())}.pem"
+        tmp_path = self._keys_dir / f".{path.stem}.{os.getpid()}.tmp"
+
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(
+                    key.private_bytes(
+                        serialization.Encoding.PEM,
+                        serialization.PrivateFormat.PKCS8,
+                        serialization.NoEncryption(),
+                    )
+                )
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _reload(self):
+        now = time.monotonic()
+        if now < self._reload_at:
+            return
+        self._reload_at = now + self._reload_interval
+
+        if not self._keys_dir.is_dir() or not any(self._keys_dir.glob("*.pem")):
+            self._generate()
+
+        # Набор файлов сравнивается вместе с mtime каталога: за один тик mtime
+        # каталог мог измениться несколько раз
+        paths = sorted(self._keys_dir.glob("*.pem"))
+        state = (self._keys_dir.stat().st_mtime_ns, tuple(path.name for path in paths))
+        if state == self._state:
+            return
+        self._state = state
+
+        private_keys = {
+            path.stem: serialization.load_pem_private_key(path.read_bytes(), None)
+            for path in paths
+        }
+        self._private_keys = private_keys
+        self._public_keys = {kid: key.public_key() for kid, key in private_keys.items()}
+        self._active_kid = max(private_keys)
+        self._jwks = {
+            "keys": [
+                {
+                    **OKPAlgorithm.to_jwk(key, as_dict=True),
+                    "kid": kid,
+                    "alg": ALGORITHM,
+                    "use": "sig",
+                }
+                for kid, key in self._public_keys.items()
+            ]
+        }
+
+    def sign(self, claims: dict) -> str:
+        self._reload()
+        return jwt.encode(
+            claims,
+            self._private_keys[self._active_kid],
+            algorithm=ALGORITHM,
+            headers={"kid": self._active_kid},
+        )
+
+    def decode(self, token: str) -> dict:
+        self._reload()
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._public_keys.get(kid)
+        if key is None:
+            raise InvalidTokenError("Unknown key id")
+        return jwt.decode(token, key, algorithms=[ALGORITHM])
+
+    def jwks(self) -> dict:
+        self._reload()
+        return self._jwks
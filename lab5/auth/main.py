@@ -1,33 +1,43 @@
 import json
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
+from itertools import batched
 from typing import Annotated
+from uuid import uuid4
 
-import jwt
 import redis.asyncio as redis
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jwt.exceptions import InvalidTokenError
-from passlib.context import CryptContext
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from dishka import FromComponent
 from dishka.integrations.fastapi import inject, setup_dishka
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from db.user import UserModel
+from directory import UserDirectory
+from search import UserSearchCache, search_users
 
+import config
 import ioc
-from db.depends import get_con
+from cache import (
+    SESSION_REVOCATION_CHANNEL,
+    USER_INVALIDATION_CHANNEL,
+    LocalCache,
+    SingleFlight,
+    publish_invalidation,
+)
+from hashing import HasherBusyError, PasswordHasher
+from keys import KeyStore
+from metrics import registry
 
-# to get a string like this run:
-# openssl rand -hex 32
-SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 USER_CACHE_EXPIRE_SECONDS = 3600  # 1 час
-
-type SessionID = str
-type Username = str
-
-fake_sessions_db: dict[Username, list[SessionID]] = {}
+USER_MISSING_EXPIRE_SECONDS = 30
+USERS_PAGE_LIMIT = 100
+USERS_PAGE_MAX_LIMIT = 1000
 
 
 class Token(BaseModel):
@@ -42,6 +52,8 @@ class TokenData(BaseModel):
 class User(BaseModel):
     username: str
     is_admin: bool = False
+    first_name: str | None = None
+    last_name: str | None = None
 
 
 class UserDBModel(User):
@@ -49,42 +61,53 @@ class UserDBModel(User):
     password: str
 
 
-class SessionUser(User):
-    user_id: int
-
-
 class CreateUser(User):
     password: str
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+USER_MISSING = object()
+"""Отметка в кэше о том, что пользователя нет в БД"""
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+user_missing_hits = registry.counter("user_missing_cache_hits_total")
+user_missing_stores = registry.counter("user_missing_cache_stores_total")
 
 
 async def get_user_from_cache(
-    redis_con: redis.Redis, username: str
-) -> UserDBModel | None:
-    cached_user = await redis_con.get(f"user:{username}")
+    redis_con: redis.Redis, user_cache: LocalCache, username: str
+) -> UserDBModel | object | None:
+    """
+    Возвращает USER_MISSING, если в кэше отмечено, что пользователя нет
+    """
+    local_user = user_cache.get(username)
+    if local_user is not None:
+        return local_user
+
+    cached_user, missing = await redis_con.mget(
+        f"user:{username}", f"nouser:{username}"
+    )
     if cached_user:
-        return UserDBModel.model_validate_json(cached_user)
+        user = UserDBModel.model_validate_json(cached_user)
+        user_cache.set(username, user)
+        return user
+
+    if missing:
+        user_cache.set(username, USER_MISSING, ttl=USER_MISSING_EXPIRE_SECONDS)
+        return USER_MISSING
 
     return None
 
 
-async def set_user_to_cache(redis_con: redis.Redis, user: UserModel):
+async def set_user_to_cache(
+    redis_con: redis.Redis, user: UserModel | UserDBModel, only_missing: bool = False
+):
+    data = user.to_dict() if isinstance(user, UserModel) else user.model_dump()
     await redis_con.set(
         f"user:{user.username}",
-        json.dumps(user.to_dict()),
+        json.dumps(data),
         ex=USER_CACHE_EXPIRE_SECONDS,
+        nx=only_missing,
     )
 
 
@@ -92,40 +115,155 @@ async def remove_user_from_cache(redis_con: redis.Redis, username: str):
     await redis_con.delete(f"user:{username}")
 
 
-async def authenticate_user(
-    username: str, password: str, con: Session, redis_con: redis.Redis
-):
-    cached_user = await get_user_from_cache(redis_con, username)
-    if cached_user:
-        if verify_password(password, cached_user.password):
-            return cached_user
+async def set_missing_user_to_cache(redis_con: redis.Redis, username: str):
+    user_missing_stores.inc()
+    await redis_con.set(f"nouser:{username}", 1, ex=USER_MISSING_EXPIRE_SECONDS)
+
+
+async def remove_missing_user_from_cache(redis_con: redis.Redis, username: str):
+    await redis_con.delete(f"nouser:{username}")
+
+
+async def revoke_user_sessions(redis_con: redis.Redis, username: str):
+    """
+    Отзывает все токены пользователя по индексу sessions:{username}
+
+    Идентификаторы токенов (jti) попадают в список отозванных revoked:{jti}
+    на время жизни токена, его проверяют сервисы, принимающие токены.
+    Об отзыве сообщается в канал sessions:revoked, чтобы сервисы сбросили
+    закэшированные токены
+    """
+    token_ids = await redis_con.smembers(f"sessions:{username}")
+    async with redis_con.pipeline(transaction=False) as pipe:
+        for token_id in token_ids:
+            pipe.set(
+                f"revoked:{token_id.decode()}",
+                1,
+                ex=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+            )
+            await publish_invalidation(
+                pipe, SESSION_REVOCATION_CHANNEL, token_id.decode()
+            )
+        pipe.delete(f"sessions:{username}")
+        await pipe.execute()
+
+
+async def invalidate_user(redis_con: redis.Redis, username: str):
+    """
+    Сбрасывает пользователя в локальных кэшах всех процессов
+    """
+    await publish_invalidation(redis_con, USER_INVALIDATION_CHANNEL, username)
+
+
+async def get_user_from_db(con: AsyncSession, username: str) -> UserModel | None:
+    return await con.scalar(select(UserModel).where(UserModel.username == username))
+
+
+async def get_user(
+    username: str,
+    session_maker: async_sessionmaker[AsyncSession],
+    redis_con: redis.Redis,
+    user_cache: LocalCache,
+    user_loader: SingleFlight,
+    warm_cache: bool = True,
+) -> UserDBModel | None:
+    """
+    Сквозное чтение пользователя: локальный кэш, Редис, затем БД
+
+    Одновременные промахи по одному пользователю выполняют один запрос в БД.
+    Общая загрузка идет в собственной сессии: отмена запроса, который ее начал,
+    не закрывает сессию под ожидающими ту же загрузку.
+    С warm_cache=False загруженный из БД пользователь не записывается в Редис,
+    запись остается вызывающему
+    """
+    cached_user = await get_user_from_cache(redis_con, user_cache, username)
+    if cached_user is USER_MISSING:
+        user_missing_hits.inc()
         return None
-    user = con.query(UserModel).filter(UserModel.username == username).first()
+    if cached_user:
+        return cached_user
+
+    async def load() -> UserDBModel | None:
+        async with session_maker() as session:
+            user = await get_user_from_db(session, username)
+        if user is None:
+            await set_missing_user_to_cache(redis_con, username)
+            user_cache.set(username, USER_MISSING, ttl=USER_MISSING_EXPIRE_SECONDS)
+            return None
+        if warm_cache:
+            await set_user_to_cache(redis_con, user)
+        return UserDBModel.model_validate(user.to_dict())
+
+    user = await user_loader.do(
+        f"user:{username}",
+        load,
+        lambda: get_user_from_cache(redis_con, user_cache, username),
+    )
+    return None if user is USER_MISSING else user
+
+
+async def authenticate_user(
+    username: str,
+    password: str,
+    session_maker: async_sessionmaker[AsyncSession],
+    redis_con: redis.Redis,
+    user_cache: LocalCache,
+    user_loader: SingleFlight,
+    hasher: PasswordHasher,
+) -> UserDBModel | None:
+    user = await get_user(
+        username, session_maker, redis_con, user_cache, user_loader, warm_cache=False
+    )
     if not user:
         return None
-    if not verify_password(password, user.password):
+    if not await hasher.verify(password, user.password):
         return None
     return user
 
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
+def create_access_token(
+    key_store: KeyStore, data: dict, expires_delta: timedelta | None = None
+):
     to_encode = data.copy()
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+        expire = now + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": now})
+    encoded_jwt = key_store.sign(to_encode)
     return encoded_jwt
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await app.state.dishka_container.close()
+
+
+app = FastAPI(lifespan=lifespan)
 setup_dishka(ioc.container, app)
 
 
+@app.exception_handler(HasherBusyError)
+async def hasher_busy_handler(request: Request, exc: HasherBusyError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Сервис перегружен, повторите запрос позже"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@inject
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    con: Annotated[Session, Depends(get_con)],
+    session_maker: Annotated[
+        async_sessionmaker[AsyncSession], FromComponent("DatabaseProvider")
+    ],
+    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    user_cache: Annotated[LocalCache, FromComponent("CacheProvider")],
+    user_loader: Annotated[SingleFlight, FromComponent("CacheProvider")],
+    key_store: Annotated[KeyStore, FromComponent("KeyProvider")],
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -133,28 +271,20 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = key_store.decode(token)
         username = payload.get("sub")
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username)
     except InvalidTokenError:
         raise credentials_exception
-    async with ioc.container() as c:
-        redis_con: redis.Redis = await c.get(redis.Redis, "RedisProvider")
-        cached_user = await get_user_from_cache(redis_con, token_data.username)
-        if cached_user:
-            return User(
-                username=str(cached_user.username), is_admin=bool(cached_user.is_admin)
-            )
-    user = (
-        con.query(UserModel).filter(UserModel.username == token_data.username).first()
+    user = await get_user(
+        token_data.username, session_maker, redis_con, user_cache, user_loader
     )
     if user is None:
         raise credentials_exception
 
-    await set_user_to_cache(redis_con, user)
-    return User(username=str(user.username), is_admin=bool(user.is_admin))
+    return User.model_validate(user, from_attributes=True)
 
 
 async def get_current_active_user(
@@ -168,13 +298,25 @@ async def get_current_active_user(
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
-    con: Annotated[Session, Depends(get_con)],
+    session_maker: Annotated[
+        async_sessionmaker[AsyncSession], FromComponent("DatabaseProvider")
+    ],
+    hasher: Annotated[PasswordHasher, FromComponent("HasherProvider")],
+    user_cache: Annotated[LocalCache, FromComponent("CacheProvider")],
+    user_loader: Annotated[SingleFlight, FromComponent("CacheProvider")],
+    key_store: Annotated[KeyStore, FromComponent("KeyProvider")],
 ) -> Token:
     """
     Ручка для получения токена
     """
     user = await authenticate_user(
-        form_data.username, form_data.password, con, redis_con
+        form_data.username,
+        form_data.password,
+        session_maker,
+        redis_con,
+        user_cache,
+        user_loader,
+        hasher,
     )
     if not user:
         raise HTTPException(
@@ -184,23 +326,47 @@ async def login_for_access_token(
         )
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    token_id = uuid4().hex
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        key_store,
+        data={
+            "sub": user.username,
+            "user_id": int(user.id),
+            "is_admin": bool(user.is_admin),
+            "jti": token_id,
+        },
+        expires_delta=access_token_expires,
     )
 
-    await redis_con.set(
-        access_token,
-        SessionUser(
-            username=str(user.username),
-            is_admin=bool(user.is_admin),
-            user_id=int(user.id),
-        ).model_dump_json(),
-        ex=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-    )
+    # Прогрев кэша пользователя и индекс сессий пользователя - за одно обращение
+    async with redis_con.pipeline(transaction=False) as pipe:
+        await set_user_to_cache(pipe, user, only_missing=True)
+        pipe.sadd(f"sessions:{user.username}", token_id)
+        pipe.expire(f"sessions:{user.username}", ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        await pipe.execute()
 
     return Token(access_token=access_token, token_type="bearer")
 
 
+@app.get("/.well-known/jwks.json")
+@inject
+async def get_jwks(
+    key_store: Annotated[KeyStore, FromComponent("KeyProvider")],
+) -> dict:
+    """
+    Ручка для получения открытых ключей проверки токенов
+    """
+    return key_store.jwks()
+
+
+@app.get("/metrics")
+async def get_metrics() -> dict:
+    """
+    Ручка для получения метрик сервиса
+    """
+    return registry.snapshot()
+
+
 @app.get("/users/me", response_model=User)
 async def read_users_me(
     current_user: Annotated[User, Depends(get_current_active_user)],
@@ -216,8 +382,10 @@ async def read_users_me(
 async def create_user(
     current_user: Annotated[User, Depends(get_current_active_user)],
     user: CreateUser,
-    con: Annotated[Session, Depends(get_con)],
+    con: Annotated[AsyncSession, FromComponent("DatabaseProvider")],
     redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    hasher: Annotated[PasswordHasher, FromComponent("HasherProvider")],
+    user_directory: Annotated[UserDirectory, FromComponent("CacheProvider")],
 ) -> User:
     """
     Ручка для создания пользователя
@@ -227,7 +395,7 @@ async def create_user(
     if current_user.is_admin == False:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
-    db_user = con.query(UserModel).filter(UserModel.username == user.username).first()
+    db_user = await get_user_from_db(con, user.username)
 
     if db_user is not None:
         raise HTTPException(
@@ -237,52 +405,243 @@ async def create_user(
 
     new_user = UserModel(
         username=user.username,
-        password=get_password_hash(user.password),
+        password=await hasher.hash(user.password),
         is_admin=user.is_admin,
+        first_name=user.first_name,
+        last_name=user.last_name,
     )
 
     con.add(new_user)
-    con.commit()
-    con.refresh(new_user)
+    await con.commit()
+    await con.refresh(new_user)
 
     await set_user_to_cache(redis_con, new_user)
+    await remove_missing_user_from_cache(redis_con, new_user.username)
+    await invalidate_user(redis_con, new_user.username)
+    await user_directory.add(new_user)
 
     return new_user
 
 
+async def provision_users(
+    batch: tuple[tuple[int, bytes | dict], ...],
+    con: AsyncSession,
+    redis_con: redis.Redis,
+    hasher: PasswordHasher,
+    user_directory: UserDirectory,
+) -> list[dict]:
+    """
+    Создает пачку пользователей одним запросом в БД
+
+    Возвращает результат по каждой строке в исходном порядке
+    """
+    results: list[dict] = []
+    users: list[tuple[dict, CreateUser]] = []
+    for line_no, record in batch:
+        result = {"line": line_no}
+        results.append(result)
+        try:
+            if isinstance(record, bytes):
+                user = CreateUser.model_validate_json(record)
+            else:
+                user = CreateUser.model_validate(record)
+        except ValidationError as e:
+            result.update(
+                status="invalid",
+                detail=e.errors(
+                    include_url=False, include_context=False, include_input=False
+                ),
+            )
+            continue
+
+        result["username"] = user.username
+        users.append((result, user))
+
+    if not users:
+        return results
+
+    password_hashes = await hasher.hash_many([user.password for _, user in users])
+    new_users = [
+        UserModel(
+            username=user.username,
+            password=password_hash,
+            is_admin=user.is_admin,
+            first_name=user.first_name,
+            last_name=user.last_name,
+        )
+        for (_, user), password_hash in zip(users, password_hashes)
+    ]
+
+    inserted = await con.execute(
+        insert(UserModel)
+        .values(
+            [
+                {
+                    "username": new_user.username,
+                    "password": new_user.password,
+                    "is_admin": new_user.is_admin,
+                    "first_name": new_user.first_name,
+                    "last_name": new_user.last_name,
+                }
+                for new_user in new_users
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=[UserModel.username])
+        .returning(UserModel.id, UserModel.username)
+    )
+    created_ids = {row.username: row.id for row in inserted}
+    await con.commit()
+
+    async with redis_con.pipeline(transaction=False) as pipe:
+        for (result, _), new_user in zip(users, new_users):
+            new_user.id = created_ids.pop(new_user.username, None)
+            if new_user.id is None:
+                result["status"] = "exists"
+                continue
+
+            result.update(status="created", id=new_user.id)
+            await set_user_to_cache(pipe, new_user)
+            await remove_missing_user_from_cache(pipe, new_user.username)
+            await invalidate_user(pipe, new_user.username)
+            await user_directory.add(new_user, client=pipe)
+
+        await pipe.execute()
+
+    return results
+
+
+@app.post("/users/bulk")
+@inject
+async def create_users_bulk(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    con: Annotated[AsyncSession, FromComponent("DatabaseProvider")],
+    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    hasher: Annotated[PasswordHasher, FromComponent("HasherProvider")],
+    user_directory: Annotated[UserDirectory, FromComponent("CacheProvider")],
+    settings: Annotated[config.Settings, FromComponent("AppProvider")],
+) -> StreamingResponse:
+    """
+    Ручка для массового создания пользователей
+
+    Принимает JSON массив или NDJSON (Content-Type: application/x-ndjson)
+    и построчно возвращает результат в формате NDJSON:
+    created - создан, exists - уже существует, invalid - ошибка в данных
+
+    Пользователей может создавать только админ
+    """
+    if current_user.is_admin == False:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    # Тело читается целиком до начала ответа: во время потоковой отдачи ответа
+    # входящие сообщения ASGI слушает StreamingResponse в ожидании разрыва соединения
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        records = [
+            (line_no, line)
+            for line_no, line in enumerate(body.splitlines(), start=1)
+            if line.strip()
+        ]
+    else:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ожидается JSON массив пользователей",
+            )
+        records = list(enumerate(payload, start=1))
+
+    async def stream_results():
+        for batch in batched(records, settings.user_bulk_batch_size):
+            results = await provision_users(
+                batch, con, redis_con, hasher, user_directory
+            )
+            for result in results:
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @app.get("/users")
 @inject
 async def get_users(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    con: Annotated[Session, Depends(get_con)],
-    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    con: Annotated[AsyncSession, FromComponent("DatabaseProvider")],
+    user_directory: Annotated[UserDirectory, FromComponent("CacheProvider")],
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=USERS_PAGE_MAX_LIMIT)] = USERS_PAGE_LIMIT,
 ) -> list[User]:
     """
-    Ручка для получения всех пользователей
+    Ручка для получения пользователей
+
+    Пользователи отсортированы по логину, для получения следующей страницы
+    нужно передать в after логин последнего пользователя
 
     Всех польхователей может получать только админ
     """
     if current_user.is_admin == False:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
-    cache = await redis_con.get("users:all")
-    if cache:
-        cached_users = json.loads(cache)
-        return [User.model_validate(user) for user in cached_users]
+    cached_users = await user_directory.page(after, limit)
+    if cached_users is not None:
+        return [User.model_validate_json(user) for user in cached_users if user]
 
-    db_users = con.query(UserModel).all()
+    # Порядок "C" совпадает с побайтовым порядком справочника в Редис
+    username = UserModel.username.collate("C")
+    query = select(
+        UserModel.username,
+        UserModel.is_admin,
+        UserModel.first_name,
+        UserModel.last_name,
+    ).order_by(username)
+    if after:
+        query = query.where(username > after)
 
-    users = [
-        User(username=str(user.username), is_admin=bool(user.is_admin))
-        for user in db_users
-    ]
+    db_users = await con.execute(query.limit(limit))
 
-    await redis_con.set(
-        "users:all",
-        json.dumps([user.model_dump() for user in users]),
-        ex=USER_CACHE_EXPIRE_SECONDS,
-    )
+    return [User.model_validate(user, from_attributes=True) for user in db_users]
+
+
+@app.get("/users/search")
+@inject
+async def find_users(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    con: Annotated[AsyncSession, FromComponent("DatabaseProvider")],
+    search_cache: Annotated[UserSearchCache, FromComponent("CacheProvider")],
+    login: str | None = None,
+    first_name: str | None = None,
+    last_name: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=USERS_PAGE_MAX_LIMIT)] = USERS_PAGE_LIMIT,
+) -> list[User]:
+    """
+    Ручка для поиска пользователей
+
+    login - префикс логина, first_name и last_name - маски имени и фамилии,
+    где * означает любое количество символов, а ? - один символ
+
+    Искать пользователей может только админ
+    """
+    if current_user.is_admin == False:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    if not (login or first_name or last_name):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Нужно указать логин, имя или фамилию",
+        )
+
+    cache_key = json.dumps([login, first_name, last_name, limit])
+    cached_users = search_cache.get(cache_key)
+    if cached_users is not None:
+        return cached_users
+
+    db_users = await search_users(con, login, first_name, last_name, limit)
+    users = [User.model_validate(user, from_attributes=True) for user in db_users]
 
+    search_cache.set(cache_key, users)
     return users
 
 
@@ -291,8 +650,9 @@ async def get_users(
 async def remove_user(
     username: str,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    con: Annotated[Session, Depends(get_con)],
+    con: Annotated[AsyncSession, FromComponent("DatabaseProvider")],
     redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    user_directory: Annotated[UserDirectory, FromComponent("CacheProvider")],
 ) -> User:
     """
     Ручка для удаления пользователя
@@ -307,7 +667,7 @@ async def remove_user(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Нельзя удалить самого себя"
         )
 
-    db_user = con.query(UserModel).filter(UserModel.username == username).first()
+    db_user = await get_user_from_db(con, username)
 
     if db_user is None:
         raise HTTPException(
@@ -315,9 +675,13 @@ async def remove_user(
             detail="Пользователь не найден",
         )
 
-    con.delete(db_user)
-    con.commit()
+    await con.delete(db_user)
+    await con.commit()
 
     await remove_user_from_cache(redis_con, username)
+    await set_missing_user_to_cache(redis_con, username)
+    await revoke_user_sessions(redis_con, username)
+    await invalidate_user(redis_con, username)
+    await user_directory.remove(username)
 
-    return User(username=str(db_user.username), is_admin=bool(db_user.is_admin))
+    return User.model_validate(db_user, from_attributes=True)
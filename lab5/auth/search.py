@@ -0,0 +1,69 @@
+from typing import NewType
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import LocalCache
+from db.user import UserModel
+
+LIKE_ESCAPE = "\\"
+
+UserSearchCache = NewType("UserSearchCache", LocalCache)
+"""Кэш результатов поиска пользователей по горячим запросам"""
+
+
+def mask_to_like(mask: str) -> str:
+    """
+    Переводит маску вида "Ив*" в шаблон LIKE
+
+    * - любое количество символов, ? - один символ
+    """
+    escaped = (
+        mask.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+def prefix_upper_bound(prefix: str) -> str:
+    """
+    Наименьшая строка, которая больше всех строк с префиксом prefix
+    при побайтовом сравнении
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+async def search_users(
+    con: AsyncSession,
+    login: str | None,
+    first_name: str | None,
+    last_name: str | None,
+    limit: int,
+):
+    """
+    Поиск пользователей по префиксу логина и маскам имени и фамилии
+
+    Префикс логина ищется диапазоном по индексу idx_budget_users_username,
+    маски имени и фамилии - по триграммным индексам
+    """
+    username = UserModel.username.collate("C")
+    query = select(
+        UserModel.username,
+        UserModel.is_admin,
+        UserModel.first_name,
+        UserModel.last_name,
+    )
+
+    if login:
+        query = query.where(username >= login, username < prefix_upper_bound(login))
+    if first_name:
+        query = query.where(
+            UserModel.first_name.ilike(mask_to_like(first_name), escape=LIKE_ESCAPE)
+        )
+    if last_name:
+        query = query.where(
+            UserModel.last_name.ilike(mask_to_like(last_name), escape=LIKE_ESCAPE)
+        )
+
+    return (await con.execute(query.order_by(username).limit(limit))).all()
@@ -0,0 +1,5 @@
+-- POST /income с токеном из переменной окружения TOKEN
+wrk.method = "POST"
+wrk.headers["Authorization"] = "Bearer " .. os.getenv("TOKEN")
+wrk.headers["Content-Type"] = "application/json"
+wrk.body = '{"amount": 100, "currency": "RUB"}'
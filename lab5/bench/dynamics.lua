@@ -0,0 +1,3 @@
+-- GET /budget/dynamics за год по месяцам с токеном из переменной окружения TOKEN
+wrk.path = "/budget/dynamics?from=2025-01-01&to=2026-01-01&bucket=" .. (os.getenv("BUCKET") or "month")
+wrk.headers["Authorization"] = "Bearer " .. os.getenv("TOKEN")
@@ -0,0 +1,39 @@
+"""
+Генератор файла для замера импорта доходов и расходов
+
+    python bench/gen_import.py --rows 1000000 > import.csv
+    python bench/gen_import.py --rows 1000000 --ndjson > import.ndjson
+"""
+
+import argparse
+import json
+import random
+import sys
+from datetime import date, timedelta
+
+START = date(2024, 1, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--ndjson", action="store_true")
+    args = parser.parse_args()
+
+    out = sys.stdout
+    if not args.ndjson:
+        out.write("amount,currency,date\n")
+
+    for _ in range(args.rows):
+        amount = random.randint(1, 100_000)
+        currency = random.choice(("RUB", "USD"))
+        day = (START + timedelta(days=random.randrange(730))).isoformat()
+        if args.ndjson:
+            row = {"amount": amount, "currency": currency, "date": day}
+            out.write(json.dumps(row) + "\n")
+        else:
+            out.write(f"{amount},{currency},{day}\n")
+
+
+if __name__ == "__main__":
+    main()
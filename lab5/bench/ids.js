@@ -0,0 +1,39 @@
+// Вставка 10 000 000 записей со строковым UUID v4 и с ObjectId в _id:
+// скорость вставки и размер индексов (_id и индекс списков) для каждого варианта
+// docker exec -i mongo mongosh mongo < bench/ids.js
+const TOTAL = 10000000;
+const USERS = 100;
+const BATCH = 10000;
+const crypto = require("crypto");
+
+const VARIANTS = {
+    uuid: () => crypto.randomUUID(),
+    objectid: () => new ObjectId(),
+};
+
+for (const [name, makeId] of Object.entries(VARIANTS)) {
+    const collection = db.getCollection(`ids_${name}`);
+    collection.drop();
+    collection.createIndex({ user_id: 1, _id: 1, amount: 1, date: 1, currency: 1 });
+
+    const started = Date.now();
+    for (let offset = 0; offset < TOTAL; offset += BATCH) {
+        const docs = [];
+        for (let i = offset; i < offset + BATCH; i++) {
+            docs.push({
+                _id: makeId(),
+                user_id: 1 + (i % USERS),
+                amount: 1 + (i % 10000),
+                currency: i % 3 === 0 ? "USD" : "RUB",
+                date: new Date(),
+            });
+        }
+        collection.insertMany(docs, { ordered: false });
+    }
+    const seconds = (Date.now() - started) / 1000;
+
+    const stats = collection.stats({ scale: 1024 * 1024 });
+    print(`${name}: ${Math.round(TOTAL / seconds)} docs/s, ${seconds} s`);
+    print(`${name}: indexes ${JSON.stringify(stats.indexSizes)} MB, total ${stats.totalIndexSize} MB`);
+    collection.drop();
+}
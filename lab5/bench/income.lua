@@ -0,0 +1,2 @@
+-- GET /income с токеном из переменной окружения TOKEN
+wrk.headers["Authorization"] = "Bearer " .. os.getenv("TOKEN")
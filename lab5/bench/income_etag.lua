@@ -0,0 +1,9 @@
+-- Повторный GET /income с If-None-Match: ETag берется из первого ответа
+wrk.path = "/income?limit=" .. (os.getenv("LIMIT") or "100")
+wrk.headers["Authorization"] = "Bearer " .. os.getenv("TOKEN")
+
+response = function(status, headers, body)
+   if headers["ETag"] then
+      wrk.headers["If-None-Match"] = headers["ETag"]
+   end
+end
@@ -0,0 +1,88 @@
+"""
+Микробенчмарк сериализации страницы списка доходов
+
+Сравнивает процессорное время на кодирование COUNT документов:
+- fastapi: модели из документов, повторная проверка ответа и jsonable_encoder,
+  как при возврате списка моделей из ручки
+- models: модели из документов и TypeAdapter.dump_json
+- raw: документы с проекцией кодируются напрямую (listing.dump_entries)
+
+    python bench/list_serialize.py --count 100000 --rounds 5
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "budget"))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from db.models import IncomeData  # noqa: E402
+from listing import LIST_PROJECTION, dump_entries  # noqa: E402
+
+ADAPTER = TypeAdapter(list[IncomeData])
+
+
+def make_docs(count: int, projected: bool) -> list[dict]:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    docs = []
+    for i in range(count):
+        doc = {
+            "_id": ObjectId(),
+            "user_id": 1,
+            "amount": i % 10000 + 1,
+            "currency": "RUB" if i % 3 else "USD",
+            "date": start + timedelta(minutes=i),
+        }
+        if projected:
+            doc = {field: doc[field] for field in LIST_PROJECTION}
+        docs.append(doc)
+    return docs
+
+
+def encode_fastapi(docs: list[dict]) -> bytes:
+    models = [IncomeData(**doc) for doc in docs]
+    checked = ADAPTER.validate_python(models)
+    return json.dumps(jsonable_encoder(checked)).encode()
+
+
+def encode_models(docs: list[dict]) -> bytes:
+    return ADAPTER.dump_json([IncomeData(**doc) for doc in docs])
+
+
+def measure(func, docs: list[dict], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.process_time()
+        func(docs)
+        best = min(best, time.process_time() - started)
+    return best
+
+
+def main(args: argparse.Namespace):
+    full = make_docs(args.count, projected=False)
+    projected = make_docs(args.count, projected=True)
+    assert json.loads(encode_models(full)) == json.loads(dump_entries(projected))
+
+    baseline = None
+    for name, func, docs in (
+        ("fastapi", encode_fastapi, full),
+        ("models", encode_models, full),
+        ("raw", dump_entries, projected),
+    ):
+        seconds = measure(func, docs, args.rounds)
+        baseline = baseline or seconds
+        print(f"{name:8} {seconds * 1000:8.1f} мс  x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,4 @@
+-- POST /token с данными пользователя из init.sql
+wrk.method = "POST"
+wrk.headers["Content-Type"] = "application/x-www-form-urlencoded"
+wrk.body = "username=vasya&password=" .. (os.getenv("PASSWORD") or "secret")
@@ -0,0 +1,26 @@
+// 10 000 000 синтетических доходов и расходов для замеров сервиса бюджета:
+// 100 пользователей, записи за 2024-2025 годы в двух валютах
+// docker exec -i mongo mongosh mongo < bench/seed_budget.js
+const TOTAL = 10000000;
+const USERS = 100;
+const BATCH = 10000;
+const START = Date.UTC(2024, 0, 1);
+const RANGE = Date.UTC(2026, 0, 1) - START;
+
+for (let offset = 0; offset < TOTAL; offset += BATCH) {
+    const incomes = [];
+    const expenses = [];
+    for (let i = offset; i < offset + BATCH; i++) {
+        const doc = {
+            user_id: 1 + (i % USERS),
+            amount: 1 + Math.floor(Math.random() * 10000),
+            currency: i % 3 === 0 ? "USD" : "RUB",
+            date: new Date(START + Math.floor(Math.random() * RANGE)),
+        };
+        (i % 2 === 0 ? incomes : expenses).push(doc);
+    }
+    db.incomes.insertMany(incomes, { ordered: false });
+    db.expenses.insertMany(expenses, { ordered: false });
+}
+
+print(db.incomes.estimatedDocumentCount(), db.expenses.estimatedDocumentCount());
@@ -0,0 +1,12 @@
+-- 1 000 000 пользователей для замеров GET /users и поиска (пароль тот же, что у vasya)
+INSERT INTO budget_users (username, password, is_admin, first_name, last_name)
+SELECT
+    'user' || g,
+    '$2b$12$Qth1TZyNfl5OBDI998wat.D1LgSffdKrDrhokb.pXhq3jZrhlaewO',
+    FALSE,
+    (ARRAY['Иван', 'Петр', 'Сергей', 'Анна', 'Мария', 'Ольга'])[1 + g % 6] || (g % 1000),
+    (ARRAY['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов'])[1 + g % 5] || (g / 1000)
+FROM generate_series(1, 1000000) AS g
+ON CONFLICT (username) DO NOTHING;
+
+ANALYZE budget_users;
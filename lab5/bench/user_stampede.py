@@ -0,0 +1,63 @@
+"""
+Стресс-тест лавины промахов кэша пользователя
+
+Сбрасывает горячий ключ user:{username} (в Редис и локальных кэшах),
+отправляет параллельные запросы GET /users/me и считает запросы в БД
+по метрике user_loader_loads_total
+
+    python bench/user_stampede.py --token ... --rounds 20 --connections 100
+"""
+
+import argparse
+import asyncio
+
+import httpx
+import redis.asyncio as redis
+
+
+async def loads_total(client: httpx.AsyncClient) -> int:
+    response = await client.get("/metrics")
+    return response.json().get("user_loader_loads_total", 0)
+
+
+async def main(args: argparse.Namespace):
+    redis_con = redis.Redis(
+        host=args.redis_host, port=args.redis_port, password=args.redis_password
+    )
+    limits = httpx.Limits(max_connections=args.connections)
+    headers = {"Authorization": f"Bearer {args.token}"}
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        total_queries = 0
+        for _ in range(args.rounds):
+            await redis_con.delete(f"user:{args.username}")
+            await redis_con.publish("users:invalidate", args.username)
+            await asyncio.sleep(0.05)
+
+            before = await loads_total(client)
+            await asyncio.gather(
+                *(
+                    client.get("/users/me", headers=headers)
+                    for _ in range(args.connections)
+                )
+            )
+            queries = await loads_total(client) - before
+            total_queries += queries
+            print(f"запросов в БД: {queries} на {args.connections} соединений")
+
+        print(f"итого: {total_queries} запросов в БД за {args.rounds} раундов")
+
+    await redis_con.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8081")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--username", default="vasya")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--redis-host", default="localhost")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--redis-password", default="P@ssw0rd")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,7 @@
+-- GET /users постранично: каждый запрос начинает со случайного логина из bench/seed_users.sql
+wrk.headers["Authorization"] = "Bearer " .. os.getenv("TOKEN")
+
+request = function()
+    local path = "/users?limit=100&after=user" .. math.random(1, 1000000)
+    return wrk.format("GET", path)
+end
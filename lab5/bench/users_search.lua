@@ -0,0 +1,12 @@
+-- GET /users/search по префиксу логина и маске фамилии ("*ов<N>")
+wrk.headers["Authorization"] = "Bearer " .. os.getenv("TOKEN")
+
+request = function()
+    local path
+    if math.random() < 0.5 then
+        path = "/users/search?login=user" .. math.random(1, 99999)
+    else
+        path = "/users/search?last_name=*%D0%BE%D0%B2" .. math.random(1, 999)
+    end
+    return wrk.format("GET", path)
+end
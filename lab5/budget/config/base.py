@@ -18,10 +18,75 @@ class Settings(BaseSettings):
     """Порт БД Редис"""
     redis_password: str
     """Пароль БД Редис"""
+    redis_max_connections: int = 50
+    """Максимальное количество подключений в пуле Редис"""
+    redis_pool_timeout: float = 5.0
+    """Время ожидания свободного подключения из пула, в секундах"""
+    redis_health_check_interval: int = 30
+    """Интервал проверки простаивающих подключений Редис, в секундах"""
+    redis_socket_timeout: float = 5.0
+    """Таймаут операций с сокетом Редис, в секундах"""
+    redis_socket_connect_timeout: float = 2.0
+    """Таймаут установки подключения к Редис, в секундах"""
+
+    auth_jwks_url: str = "http://auth:8081/.well-known/jwks.json"
+    """Адрес открытых ключей сервиса авторизации"""
+    auth_jwks_ttl: float = 300.0
+    """Время кэширования открытых ключей, в секундах"""
+    auth_check_revocation: bool = True
+    """Проверять список отозванных токенов в Редис"""
+    session_cache_size: int = 10000
+    """Максимальное количество проверенных токенов в кэше процесса"""
+    session_cache_ttl: float = 60.0
+    """Время жизни проверенного токена в кэше процесса, в секундах"""
 
     mongo_db: str
     """Имя БД MongoDB"""
     mongo_url: str
     """URL MongoDB"""
+    mongo_max_pool_size: int = 100
+    """Максимальное количество подключений в пуле MongoDB"""
+    mongo_min_pool_size: int = 0
+    """Минимальное количество подключений, которые пул держит открытыми"""
+    mongo_max_idle_time_ms: int = 60000
+    """Время простоя подключения MongoDB до закрытия, в миллисекундах"""
+    mongo_connect_timeout_ms: int = 2000
+    """Таймаут установки подключения к MongoDB, в миллисекундах"""
+    mongo_server_selection_timeout_ms: int = 5000
+    """Время ожидания доступного сервера MongoDB, в миллисекундах"""
+    mongo_timeout_ms: int = 10000
+    """Общий таймаут операции MongoDB с ожиданием подключения, в миллисекундах"""
+    list_stream_batch_size: int = 500
+    """Количество документов в одной пачке при потоковой отдаче списков в NDJSON"""
+    list_cache_ttl: int = 300
+    """Время жизни закэшированных страниц списков, в секундах, 0 - кэш выключен"""
+    import_batch_size: int = 5000
+    """Количество записей в одной вставке при импорте доходов и расходов"""
+    import_write_concern: str = "1"
+    """Уровень подтверждения записи при импорте: число узлов или majority"""
+    import_write_journal: bool = False
+    """Ждать записи импорта в журнал MongoDB"""
+    insert_batch_size: int = 1
+    """Максимальное количество записей в групповой вставке, 1 - без группировки"""
+    insert_linger_ms: float = 5.0
+    """Время накопления записей для групповой вставки, в миллисекундах"""
+    insert_write_concern: str = "1"
+    """Уровень подтверждения групповой вставки: число узлов или majority"""
+    insert_write_journal: bool = True
+    """Ждать записи групповой вставки в журнал MongoDB"""
+
+    rates_file: str = "rates.csv"
+    """Файл курсов валют, которым заполняется пустая таблица курсов"""
+    rates_refresh_interval: float = 60.0
+    """Интервал проверки версии таблицы курсов, в секундах"""
+
+    report_ttl: int = 3600
+    """Время хранения отчетов и их результатов, в секундах"""
+    report_workers: int = 2
+    """Количество процессов сервиса отчетов"""
+    report_pop_timeout: float = 1.0
+    """Время ожидания задачи из очереди отчетов, меньше таймаута сокета Редис, в секундах"""
+    report_job_timeout: int = 600
+    """Время, после которого незавершенный отчет не переиспользуется, в секундах"""
 
 settings = Settings(_env_file=".env")  # type: ignore
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+Заполнение даты у доходов и расходов, сохраненных до появления поля date
+
+Записи без даты не попадают в динамику бюджета и итоги по месяцам.
+Им проставляется одна дата: --date (YYYY-MM-DD) или время запуска команды.
+После заполнения увеличиваются версии данных затронутых пользователей,
+итоги по месяцам пересчитывает команда db.rebuild_rollups.
+С --check только выводится количество записей без даты.
+Запуск: python -m db.backfill_dates [--check] [--date YYYY-MM-DD]
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+import redis.asyncio as redis
+from dishka import make_async_container
+from pymongo.asynchronous.database import AsyncDatabase
+
+import config
+from db.mongo import EXPENSE_COLLECTION, INCOME_COLLECTION
+from ioc import providers
+from versions import bump_data_version
+
+UNDATED_FILTER = {"date": {"$exists": False}}
+
+
+async def backfill_dates(check: bool, date: datetime):
+    container = make_async_container(
+        providers.AppProvider(),
+        providers.RedisProvider(),
+        providers.MongoProvider(),
+        context={config.Settings: config.settings},
+    )
+    try:
+        db = await container.get(AsyncDatabase, component="MongoProvider")
+        redis_con = await container.get(redis.Redis, component="RedisProvider")
+
+        user_ids: set[int] = set()
+        for name in (INCOME_COLLECTION, EXPENSE_COLLECTION):
+            if check:
+                undated = await db[name].count_documents(UNDATED_FILTER)
+                print(f"{name}: {undated} documents without date")
+                continue
+
+            user_ids.update(await db[name].distinct("user_id", UNDATED_FILTER))
+            result = await db[name].update_many(
+                UNDATED_FILTER, {"$set": {"date": date}}
+            )
+            print(f"{name}: set date on {result.modified_count} documents")
+
+        for user_id in user_ids:
+            await bump_data_version(redis_con, user_id)
+    finally:
+        await container.close()
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Заполнение даты записей")
+    parser.add_argument("--check", action="store_true", help="только посчитать")
+    parser.add_argument("--date", type=parse_date, default=None)
+    args = parser.parse_args()
+
+    asyncio.run(backfill_dates(args.check, args.date or datetime.now(timezone.utc)))
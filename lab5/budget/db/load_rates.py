@@ -0,0 +1,43 @@
+"""
+Загрузка курсов валют из CSV с колонками date (YYYY-MM-DD), currency и rate
+
+Курсы добавляются или обновляются, после загрузки увеличивается версия
+таблицы курсов, и процессы сервиса перечитывают ее.
+Запуск: python -m db.load_rates rates.csv
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+
+import redis.asyncio as redis
+from dishka import make_async_container
+from pymongo.asynchronous.database import AsyncDatabase
+
+import config
+from db.mongo import RATE_COLLECTION
+from ioc import providers
+from rates import load_rates, read_rates_file
+
+
+async def main(path: Path):
+    container = make_async_container(
+        providers.AppProvider(),
+        providers.RedisProvider(),
+        providers.MongoProvider(),
+        context={config.Settings: config.settings},
+    )
+    try:
+        redis_con = await container.get(redis.Redis, component="RedisProvider")
+        db = await container.get(AsyncDatabase, component="MongoProvider")
+        rows = read_rates_file(path)
+        await load_rates(db[RATE_COLLECTION], redis_con, rows)
+        print(f"loaded rates: {len(rows)}")
+    finally:
+        await container.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Загрузка курсов валют")
+    parser.add_argument("path", type=Path)
+    asyncio.run(main(parser.parse_args().path))
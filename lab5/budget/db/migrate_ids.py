@@ -0,0 +1,109 @@
+"""
+Перевод строковых идентификаторов доходов и расходов в ObjectId
+
+Документы со строковым _id переписываются пачками по --batch-size:
+новый _id собирается из времени записи (date) и хеша прежнего идентификатора,
+прежний сохраняется в поле legacy_id. Записям без даты берется время UNDATED,
+поэтому перед переносом лучше проставить даты командой db.backfill_dates. Повторный запуск после сбоя безопасен:
+уже вставленные копии дают одинаковый _id и пропускаются. После переноса
+увеличиваются версии данных затронутых пользователей, чтобы закэшированные
+страницы со старыми курсорами больше не отдавались.
+С --check только выводится количество документов со строковым _id.
+Запуск: python -m db.migrate_ids [--check] [--batch-size N]
+"""
+
+import argparse
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+
+import redis.asyncio as redis
+from bson import ObjectId
+from dishka import make_async_container
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import BulkWriteError
+
+import config
+from db.mongo import EXPENSE_COLLECTION, INCOME_COLLECTION
+from ioc import providers
+from versions import bump_data_version
+
+LEGACY_FILTER = {"_id": {"$type": "string"}}
+DUPLICATE_KEY = 11000
+UNDATED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def migrated_id(doc: dict) -> ObjectId:
+    """
+    ObjectId прежней записи: 4 байта времени записи и 8 байт хеша
+    строкового идентификатора, поэтому повторный перенос дает тот же _id
+    """
+    date = doc.get("date") or UNDATED
+    seconds = int(date.replace(tzinfo=date.tzinfo or timezone.utc).timestamp())
+    digest = hashlib.sha1(doc["_id"].encode()).digest()
+    return ObjectId(seconds.to_bytes(4, "big") + digest[:8])
+
+
+async def migrate_collection(
+    collection: AsyncCollection, batch_size: int
+) -> tuple[int, set[int]]:
+    migrated = 0
+    user_ids: set[int] = set()
+    while docs := await collection.find(LEGACY_FILTER).limit(batch_size).to_list():
+        try:
+            await collection.insert_many(
+                [
+                    {**doc, "_id": migrated_id(doc), "legacy_id": doc["_id"]}
+                    for doc in docs
+                ],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            if any(
+                error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]
+            ):
+                raise
+
+        await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        migrated += len(docs)
+        user_ids.update(doc["user_id"] for doc in docs)
+
+    return migrated, user_ids
+
+
+async def migrate_ids(check: bool, batch_size: int):
+    container = make_async_container(
+        providers.AppProvider(),
+        providers.RedisProvider(),
+        providers.MongoProvider(),
+        context={config.Settings: config.settings},
+    )
+    try:
+        db = await container.get(AsyncDatabase, component="MongoProvider")
+        redis_con = await container.get(redis.Redis, component="RedisProvider")
+
+        user_ids: set[int] = set()
+        for name in (INCOME_COLLECTION, EXPENSE_COLLECTION):
+            if check:
+                legacy = await db[name].count_documents(LEGACY_FILTER)
+                print(f"{name}: {legacy} documents with string _id")
+                continue
+
+            migrated, users = await migrate_collection(db[name], batch_size)
+            user_ids |= users
+            print(f"{name}: migrated {migrated} documents")
+
+        for user_id in user_ids:
+            await bump_data_version(redis_con, user_id)
+    finally:
+        await container.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перевод _id записей в ObjectId")
+    parser.add_argument("--check", action="store_true", help="только посчитать")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(migrate_ids(args.check, args.batch_size))
@@ -1,7 +1,21 @@
+from datetime import datetime, timezone
 from enum import StrEnum
+from typing import Annotated, Any
 
 from bson import ObjectId
-from pydantic import BaseModel, PositiveInt, Field
+from pydantic import AfterValidator, BaseModel, PositiveInt, Field, model_validator
+
+
+def as_utc(value: datetime) -> datetime:
+    """
+    Время без часового пояса считается UTC, остальное переводится в UTC
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+UtcDatetime = Annotated[datetime, AfterValidator(as_utc)]
 
 
 class Currency(StrEnum):
@@ -9,6 +23,24 @@ class Currency(StrEnum):
     RUB = "RUB"
 
 
+class EntryKind(StrEnum):
+    INCOME = "income"
+    EXPENSE = "expense"
+
+
+class Bucket(StrEnum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class ReportStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
 class TokenType(StrEnum):
     BEARER = "Bearer"
 
@@ -17,6 +49,16 @@ class CommonHeaders(BaseModel):
     authorization: str
 
 
+class ListQuery(BaseModel):
+    cursor: str | None = None
+    limit: int | None = Field(default=None, ge=1, le=1000)
+    currency: Currency | None = None
+    amount_min: PositiveInt | None = None
+    amount_max: PositiveInt | None = None
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+
+
 class SessionUser(BaseModel):
     username: str
     is_admin: bool = False
@@ -26,6 +68,7 @@ class SessionUser(BaseModel):
 class BudgetData(BaseModel):
     amount: PositiveInt
     currency: Currency
+    date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 class IncomeData(BudgetData):
@@ -37,10 +80,13 @@ class ExpenseData(BudgetData):
 
 
 class MongoModel(BaseModel):
-    id: str = Field(alias="_id")
+    # Новые записи получают ObjectId, строковые идентификаторы старых записей
+    # переводит в ObjectId команда db.migrate_ids
+    id: ObjectId | str = Field(alias="_id", default_factory=ObjectId)
 
     class Config:
         populate_by_name = True
+        arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
 
 
@@ -50,3 +96,89 @@ class IncomeInDB(MongoModel, IncomeData):
 
 class ExpenseInDB(MongoModel, ExpenseData):
     user_id: int
+
+
+class DynamicsPoint(BaseModel):
+    start: datetime
+    income: int
+    expense: int
+    net: int
+
+
+class ConvertedPoint(BaseModel):
+    start: datetime
+    income: float
+    expense: float
+    net: float
+
+
+class ConvertedDynamics(BaseModel):
+    currency: Currency
+    points: list[ConvertedPoint]
+
+
+class BudgetDynamics(BaseModel):
+    date_from: datetime
+    date_to: datetime
+    bucket: Bucket
+    series: dict[Currency, list[DynamicsPoint]]
+    converted: ConvertedDynamics | None = None
+
+
+class BalanceItem(BaseModel):
+    income: int = 0
+    expense: int = 0
+    balance: int = 0
+
+
+class ConvertedBalance(BaseModel):
+    currency: Currency
+    income: float
+    expense: float
+    balance: float
+
+
+class Balance(BaseModel):
+    period: str
+    currencies: dict[Currency, BalanceItem]
+    converted: ConvertedBalance | None = None
+
+
+class ImportRowError(BaseModel):
+    line: int
+    detail: Any
+
+
+class ImportResult(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: list[ImportRowError]
+    seconds: float
+    rows_per_second: int
+
+
+class ReportParams(BaseModel):
+    date_from: UtcDatetime
+    date_to: UtcDatetime
+    bucket: Bucket = Bucket.MONTH
+
+    @model_validator(mode="after")
+    def check_period(self):
+        if self.date_from >= self.date_to:
+            raise ValueError("Period start must be before its end")
+        return self
+
+
+class Report(BaseModel):
+    totals: dict[Currency, BalanceItem]
+    dynamics: BudgetDynamics
+
+
+class ReportJob(BaseModel):
+    id: str
+    status: ReportStatus
+    params: ReportParams
+    result: Report | None = None
+    error: str | None = None
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -1,13 +1,68 @@
-from pymongo import MongoClient, ASCENDING
-from config import settings
+from typing import NewType
 
-client = MongoClient(settings.mongo_url)
-db = client[settings.mongo_db]
+from pymongo import ASCENDING
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 
-income_collection = db.incomes
-expense_collection = db.expenses
+INCOME_COLLECTION = "incomes"
+EXPENSE_COLLECTION = "expenses"
+ROLLUP_COLLECTION = "rollups"
+RATE_COLLECTION = "rates"
 
+IncomeCollection = NewType("IncomeCollection", AsyncCollection)
+ExpenseCollection = NewType("ExpenseCollection", AsyncCollection)
+RollupCollection = NewType("RollupCollection", AsyncCollection)
+RateCollection = NewType("RateCollection", AsyncCollection)
 
-def create_indexes():
-    income_collection.create_index([("user_id", ASCENDING)])
-    expense_collection.create_index([("user_id", ASCENDING)])
+# Индексы списков строятся по правилу "равенство, сортировка, диапазон" и
+# начинаются с user_id, поэтому заменяют прежний одиночный индекс по user_id.
+# Индекс по дате покрывает агрегацию динамики бюджета. Индексы списков
+# содержат все поля ответа, чтобы запросы списков покрывались индексом
+INDEXES = [
+    [
+        ("user_id", ASCENDING),
+        ("_id", ASCENDING),
+        ("amount", ASCENDING),
+        ("date", ASCENDING),
+        ("currency", ASCENDING),
+    ],
+    [
+        ("user_id", ASCENDING),
+        ("currency", ASCENDING),
+        ("_id", ASCENDING),
+        ("amount", ASCENDING),
+        ("date", ASCENDING),
+    ],
+    [
+        ("user_id", ASCENDING),
+        ("date", ASCENDING),
+        ("currency", ASCENDING),
+        ("amount", ASCENDING),
+    ],
+]
+
+OBSOLETE_INDEXES = [
+    "user_id_1",
+    "user_id_1__id_1_amount_1",
+    "user_id_1_currency_1__id_1_amount_1",
+    "user_id_1__id_1_amount_1_date_1",
+]
+
+
+async def create_indexes(db: AsyncDatabase):
+    for name in (INCOME_COLLECTION, EXPENSE_COLLECTION):
+        collection = db[name]
+        for keys in INDEXES:
+            await collection.create_index(keys)
+
+        existing = await collection.index_information()
+        for index_name in OBSOLETE_INDEXES:
+            if index_name in existing:
+                await collection.drop_index(index_name)
+
+    await db[ROLLUP_COLLECTION].create_index(
+        [("user_id", ASCENDING), ("period", ASCENDING)], unique=True
+    )
+    await db[RATE_COLLECTION].create_index(
+        [("currency", ASCENDING), ("date", ASCENDING)], unique=True
+    )
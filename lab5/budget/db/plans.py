@@ -0,0 +1,107 @@
+"""
+Проверка планов запросов списков доходов и расходов и динамики бюджета
+
+Для каждой поддерживаемой формы фильтра выполняет explain и падает,
+если MongoDB выбирает полный перебор коллекции (COLLSCAN), сортировку
+в памяти (SORT) или читает документы (FETCH), то есть запрос списка
+не покрыт индексом. Для каждой формы выводятся стадии плана и индексы.
+Запуск: python -m db.plans
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, AsyncMongoClient
+
+from config import settings
+from db.models import Bucket, Currency, ListQuery
+from db.mongo import EXPENSE_COLLECTION, INCOME_COLLECTION, create_indexes
+from dynamics import dynamics_pipeline
+from listing import LIST_PROJECTION, build_filter, encode_cursor
+
+PERIOD_FROM = datetime(2025, 1, 1, tzinfo=timezone.utc)
+PERIOD_TO = datetime(2025, 7, 1, tzinfo=timezone.utc)
+PERIOD_CURSOR = encode_cursor({"_id": ObjectId.from_datetime(PERIOD_FROM)})
+
+FILTER_SHAPES = {
+    "user": ListQuery(),
+    "cursor": ListQuery(cursor=PERIOD_CURSOR),
+    "currency": ListQuery(currency=Currency.RUB),
+    "amount": ListQuery(amount_min=100, amount_max=1000),
+    "date": ListQuery(date_from=PERIOD_FROM, date_to=PERIOD_TO),
+    "currency_amount": ListQuery(
+        currency=Currency.USD, amount_min=100, cursor=PERIOD_CURSOR
+    ),
+    "currency_date": ListQuery(
+        currency=Currency.RUB, date_from=PERIOD_FROM, date_to=PERIOD_TO
+    ),
+}
+
+
+def plan_stages(plan: dict) -> set[str]:
+    stages = {plan["stage"]}
+    for child in plan.get("inputStages", [plan.get("inputStage")]):
+        if child:
+            stages |= plan_stages(child)
+    return stages
+
+
+def plan_indexes(plan: dict) -> set[str]:
+    indexes = {plan["indexName"]} if "indexName" in plan else set()
+    for child in plan.get("inputStages", [plan.get("inputStage")]):
+        if child:
+            indexes |= plan_indexes(child)
+    return indexes
+
+
+async def check_plans() -> bool:
+    mongo_client = AsyncMongoClient(settings.mongo_url)
+    db = mongo_client[settings.mongo_db]
+    await create_indexes(db)
+
+    ok = True
+    for collection_name in (INCOME_COLLECTION, EXPENSE_COLLECTION):
+        for shape, query in FILTER_SHAPES.items():
+            cursor = (
+                db[collection_name]
+                .find(build_filter(1, query), LIST_PROJECTION)
+                .sort("_id", ASCENDING)
+                .limit(101)
+            )
+            explain = await cursor.explain()
+            plan = explain["queryPlanner"]["winningPlan"]
+            stages = plan_stages(plan)
+            failed = stages & {"COLLSCAN", "SORT", "FETCH"}
+            ok = ok and not failed
+            status = "FAIL" if failed else "ok"
+            print(
+                f"{status:4} {collection_name}.{shape}: {', '.join(sorted(stages))}"
+                f" [{', '.join(sorted(plan_indexes(plan)))}]"
+            )
+
+    for bucket in Bucket:
+        explain = await db.command(
+            "aggregate",
+            INCOME_COLLECTION,
+            pipeline=dynamics_pipeline(1, PERIOD_FROM, PERIOD_TO, bucket),
+            explain=True,
+        )
+        cursor_stage = explain["stages"][0]["$cursor"]
+        plan = cursor_stage["queryPlanner"]["winningPlan"]
+        stages = plan_stages(plan)
+        failed = "COLLSCAN" in stages
+        ok = ok and not failed
+        status = "FAIL" if failed else "ok"
+        print(
+            f"{status:4} dynamics.{bucket}: {', '.join(sorted(stages))}"
+            f" [{', '.join(sorted(plan_indexes(plan)))}]"
+        )
+
+    await mongo_client.close()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_plans()) else 1)
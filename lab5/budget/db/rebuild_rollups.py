@@ -0,0 +1,189 @@
+"""
+Пересчет итогов пользователей по исходным записям доходов и расходов
+
+Пользователи делятся на пачки по --chunk-size, пачки пересчитываются
+параллельно в --workers задач. Для каждой пачки итоги считаются агрегацией,
+сравниваются с сохраненными, и разница прибавляется к сохраненным через $inc.
+С --check расхождения только выводятся, код возврата 1 при их наличии.
+Запуск: python -m db.rebuild_rollups [--check] [--workers N] [--chunk-size N]
+"""
+
+import argparse
+import asyncio
+import sys
+
+from pymongo import AsyncMongoClient, DeleteOne, UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+
+from config import settings
+from db.models import EntryKind
+from db.mongo import EXPENSE_COLLECTION, INCOME_COLLECTION, ROLLUP_COLLECTION
+from rollups import TOTAL_PERIOD
+
+COLLECTIONS = {
+    EntryKind.INCOME: INCOME_COLLECTION,
+    EntryKind.EXPENSE: EXPENSE_COLLECTION,
+}
+
+
+async def compute_rollups(db: AsyncDatabase, user_ids: list[int]) -> dict:
+    """
+    Считает итоги пользователей из пачки: {(user_id, period): документ итогов}
+    """
+    rollups: dict[tuple[int, str], dict] = {}
+    for kind, collection_name in COLLECTIONS.items():
+        cursor = await db[collection_name].aggregate(
+            [
+                {"$match": {"user_id": {"$in": user_ids}}},
+                {
+                    "$group": {
+                        "_id": {
+                            "user_id": "$user_id",
+                            "month": {
+                                "$dateToString": {"date": "$date", "format": "%Y-%m"}
+                            },
+                            "currency": "$currency",
+                        },
+                        "amount": {"$sum": "$amount"},
+                    }
+                },
+            ],
+            allowDiskUse=True,
+        )
+        async for row in cursor:
+            key = row["_id"]
+            periods = [TOTAL_PERIOD]
+            if key.get("month"):
+                periods.append(key["month"])
+
+            for period in periods:
+                doc = rollups.setdefault(
+                    (key["user_id"], period),
+                    {"user_id": key["user_id"], "period": period},
+                )
+                amounts = doc.setdefault(kind.value, {})
+                amounts[key["currency"]] = (
+                    amounts.get(key["currency"], 0) + row["amount"]
+                )
+
+    return rollups
+
+
+def amount_deltas(current: dict, expected: dict) -> dict[str, int]:
+    """
+    Поправки итога в виде полей для $inc: {"income.RUB": разница, ...}
+    """
+    deltas = {}
+    for kind in EntryKind:
+        stored = current.get(kind.value, {})
+        computed = expected.get(kind.value, {})
+        for currency in stored.keys() | computed.keys():
+            delta = computed.get(currency, 0) - stored.get(currency, 0)
+            if delta:
+                deltas[f"{kind.value}.{currency}"] = delta
+    return deltas
+
+
+async def find_drift(db: AsyncDatabase, user_ids: list[int]) -> dict:
+    """
+    Находит расхождения итогов пачки пользователей:
+    {(user_id, period): (сохраненный документ, поправки, есть ли записи)}
+    """
+    expected = await compute_rollups(db, user_ids)
+
+    stored = {}
+    async for doc in db[ROLLUP_COLLECTION].find({"user_id": {"$in": user_ids}}):
+        stored[(doc["user_id"], doc["period"])] = doc
+
+    drift = {}
+    for key in expected.keys() | stored.keys():
+        current = stored.get(key, {})
+        if deltas := amount_deltas(current, expected.get(key, {})):
+            drift[key] = (current, deltas, key in expected)
+    return drift
+
+
+async def rebuild_chunk(db: AsyncDatabase, user_ids: list[int], check: bool) -> int:
+    """
+    Пересчитывает итоги пачки пользователей и возвращает количество расхождений
+
+    Итоги не перезаписываются, а исправляются через $inc на разницу, поэтому
+    увеличения от параллельных POST /income и POST /expenses не теряются.
+    Запись, вставленная между агрегацией и чтением итогов, выглядит как
+    расхождение, пока ее увеличение не применено. Поэтому расхождение
+    исправляется, только если повторный подсчет дал ту же поправку.
+    Итог без записей удаляется, только если он не изменился с момента чтения
+    """
+    drift = await find_drift(db, user_ids)
+    for (user_id, period), (current, deltas, _) in drift.items():
+        print(f"drift user_id={user_id} period={period}: {current} off by {deltas}")
+
+    if not drift or check:
+        return len(drift)
+
+    confirmed = await find_drift(db, sorted({user_id for user_id, _ in drift}))
+    requests = []
+    for key, (current, deltas, has_entries) in confirmed.items():
+        if key not in drift or drift[key][1] != deltas:
+            continue
+
+        user_id, period = key
+        if has_entries:
+            requests.append(
+                UpdateOne(
+                    {"user_id": user_id, "period": period},
+                    {"$inc": deltas},
+                    upsert=True,
+                )
+            )
+        else:
+            amounts = {
+                kind.value: current[kind.value]
+                for kind in EntryKind
+                if kind.value in current
+            }
+            requests.append(DeleteOne({"_id": current["_id"], **amounts}))
+
+    if requests:
+        await db[ROLLUP_COLLECTION].bulk_write(requests, ordered=False)
+
+    return len(drift)
+
+
+async def rebuild_rollups(check: bool, workers: int, chunk_size: int) -> int:
+    mongo_client = AsyncMongoClient(settings.mongo_url, tz_aware=True)
+    db = mongo_client[settings.mongo_db]
+
+    user_ids = set()
+    for collection_name in (*COLLECTIONS.values(), ROLLUP_COLLECTION):
+        user_ids.update(await db[collection_name].distinct("user_id"))
+    user_ids = sorted(user_ids)
+
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(chunk: list[int]) -> int:
+        async with semaphore:
+            return await rebuild_chunk(db, chunk, check)
+
+    drifts = await asyncio.gather(
+        *(
+            run(user_ids[i : i + chunk_size])
+            for i in range(0, len(user_ids), chunk_size)
+        )
+    )
+    await mongo_client.close()
+
+    total = sum(drifts)
+    print(f"users: {len(user_ids)}, drifted rollups: {total}")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчет итогов пользователей")
+    parser.add_argument("--check", action="store_true", help="только найти расхождения")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=100)
+    args = parser.parse_args()
+
+    drifted = asyncio.run(rebuild_rollups(args.check, args.workers, args.chunk_size))
+    sys.exit(1 if args.check and drifted else 0)
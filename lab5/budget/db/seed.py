@@ -1,42 +1,110 @@
-from .mongo import income_collection, expense_collection, create_indexes
-from .models import IncomeInDB, ExpenseInDB, Currency
+from datetime import datetime, timezone
+from pathlib import Path
 
+from pymongo.asynchronous.database import AsyncDatabase
 
-def seed_data():
-    create_indexes()
+from config import settings
+from rates import load_rates, read_rates_file
+from rollups import rollup_updates
 
-    if income_collection.count_documents({}) == 0:
-        income_collection.insert_many(
+from .mongo import (
+    EXPENSE_COLLECTION,
+    INCOME_COLLECTION,
+    RATE_COLLECTION,
+    ROLLUP_COLLECTION,
+    create_indexes,
+)
+from .models import IncomeInDB, ExpenseInDB, Currency, EntryKind
+
+SEED_DATE = datetime(2025, 1, 15, tzinfo=timezone.utc)
+
+
+async def seed_data(db: AsyncDatabase):
+    await create_indexes(db)
+
+    income_collection = db[INCOME_COLLECTION]
+    expense_collection = db[EXPENSE_COLLECTION]
+    rollup_collection = db[ROLLUP_COLLECTION]
+    rate_collection = db[RATE_COLLECTION]
+
+    rates_file = Path(settings.rates_file)
+    if rates_file.is_file() and await rate_collection.count_documents({}) == 0:
+        await load_rates(rate_collection, None, read_rates_file(rates_file))
+
+    if await income_collection.count_documents({}) == 0:
+        incomes = [
+            IncomeInDB(
+                user_id=1,
+                amount=1000,
+                currency=Currency.USD,
+                date=SEED_DATE,
+            ),
+            IncomeInDB(
+                user_id=2,
+                amount=1500,
+                currency=Currency.RUB,
+                date=SEED_DATE,
+            ),
+            IncomeInDB(
+                user_id=3,
+                amount=2000,
+                currency=Currency.USD,
+                date=SEED_DATE,
+            ),
+            IncomeInDB(
+                user_id=4,
+                amount=2500,
+                currency=Currency.RUB,
+                date=SEED_DATE,
+            ),
+        ]
+        await income_collection.insert_many(
+            [income.model_dump(by_alias=True) for income in incomes]
+        )
+        await rollup_collection.bulk_write(
             [
-                IncomeInDB(
-                    _id="1", user_id=1, amount=1000, currency=Currency.USD
-                ).model_dump(by_alias=True),
-                IncomeInDB(
-                    _id="2", user_id=2, amount=1500, currency=Currency.RUB
-                ).model_dump(by_alias=True),
-                IncomeInDB(
-                    _id="3", user_id=3, amount=2000, currency=Currency.USD
-                ).model_dump(by_alias=True),
-                IncomeInDB(
-                    _id="4", user_id=4, amount=2500, currency=Currency.RUB
-                ).model_dump(by_alias=True),
+                update
+                for income in incomes
+                for update in rollup_updates(income.user_id, EntryKind.INCOME, [income])
             ]
         )
 
-    if expense_collection.count_documents({}) == 0:
-        expense_collection.insert_many(
+    if await expense_collection.count_documents({}) == 0:
+        expenses = [
+            ExpenseInDB(
+                user_id=1,
+                amount=500,
+                currency=Currency.USD,
+                date=SEED_DATE,
+            ),
+            ExpenseInDB(
+                user_id=2,
+                amount=700,
+                currency=Currency.RUB,
+                date=SEED_DATE,
+            ),
+            ExpenseInDB(
+                user_id=3,
+                amount=900,
+                currency=Currency.USD,
+                date=SEED_DATE,
+            ),
+            ExpenseInDB(
+                user_id=4,
+                amount=1200,
+                currency=Currency.RUB,
+                date=SEED_DATE,
+            ),
+        ]
+        await expense_collection.insert_many(
+            [expense.model_dump(by_alias=True) for expense in expenses]
+        )
+        await rollup_collection.bulk_write(
             [
-                ExpenseInDB(
-                    _id="1", user_id=1, amount=500, currency=Currency.USD
-                ).model_dump(by_alias=True),
-                ExpenseInDB(
-                    _id="2", user_id=2, amount=700, currency=Currency.RUB
-                ).model_dump(by_alias=True),
-                ExpenseInDB(
-                    _id="3", user_id=3, amount=900, currency=Currency.USD
-                ).model_dump(by_alias=True),
-                ExpenseInDB(
-                    _id="4", user_id=4, amount=1200, currency=Currency.RUB
-                ).model_dump(by_alias=True),
+                update
+                for expense in expenses
+                for update in rollup_updates(
+                    expense.user_id, EntryKind.EXPENSE, [expense]
+                )
             ]
         )
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from pymongo.asynchronous.database import AsyncDatabase
+
+from db.models import Bucket, BudgetDynamics, DynamicsPoint, EntryKind
+from db.mongo import EXPENSE_COLLECTION, INCOME_COLLECTION
+
+
+def _entries(
+    user_id: int, date_from: datetime, date_to: datetime, kind: EntryKind
+) -> list[dict]:
+    # Совпадение и проекция используют только поля индекса (user_id, date,
+    # currency, amount), поэтому документы коллекции не читаются
+    return [
+        {
+            "$match": {
+                "user_id": user_id,
+                "date": {"$gte": date_from, "$lt": date_to},
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "date": 1,
+                "currency": 1,
+                "amount": 1,
+                "kind": {"$literal": kind.value},
+            }
+        },
+    ]
+
+
+def _sum_of(kind: EntryKind) -> dict:
+    return {"$sum": {"$cond": [{"$eq": ["$kind", kind.value]}, "$amount", 0]}}
+
+
+def dynamics_pipeline(
+    user_id: int, date_from: datetime, date_to: datetime, bucket: Bucket
+) -> list[dict]:
+    """
+    Конвейер агрегации доходов и расходов пользователя по периодам и валютам
+
+    Запускается на коллекции доходов, расходы присоединяются через $unionWith
+    """
+    truncate = {"date": "$date", "unit": bucket.value}
+    if bucket == Bucket.WEEK:
+        truncate["startOfWeek"] = "monday"
+
+    expenses = _entries(user_id, date_from, date_to, EntryKind.EXPENSE)
+    return [
+        *_entries(user_id, date_from, date_to, EntryKind.INCOME),
+        {"$unionWith": {"coll": EXPENSE_COLLECTION, "pipeline": expenses}},
+        {
+            "$group": {
+                "_id": {
+                    "start": {"$dateTrunc": truncate},
+                    "currency": "$currency",
+                },
+                "income": _sum_of(EntryKind.INCOME),
+                "expense": _sum_of(EntryKind.EXPENSE),
+            }
+        },
+        {"$sort": {"_id.start": 1}},
+    ]
+
+
+async def get_dynamics(
+    db: AsyncDatabase,
+    user_id: int,
+    date_from: datetime,
+    date_to: datetime,
+    bucket: Bucket,
+) -> BudgetDynamics:
+    """
+    Считает доходы, расходы и их разницу за каждый период в каждой валюте
+    Периоды без записей в ряд не попадают
+    """
+    series: dict[str, list[DynamicsPoint]] = {}
+    cursor = await db[INCOME_COLLECTION].aggregate(
+        dynamics_pipeline(user_id, date_from, date_to, bucket)
+    )
+    async for row in cursor:
+        series.setdefault(row["_id"]["currency"], []).append(
+            DynamicsPoint(
+                start=row["_id"]["start"],
+                income=row["income"],
+                expense=row["expense"],
+                net=row["income"] - row["expense"],
+            )
+        )
+
+    return BudgetDynamics(
+        date_from=date_from, date_to=date_to, bucket=bucket, series=series
+    )
@@ -0,0 +1,183 @@
+import asyncio
+import codecs
+import csv
+import time
+from typing import AsyncIterator
+
+from bson import ObjectId
+from fastapi import Request
+from pydantic import ValidationError
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+from db.models import BudgetData, EntryKind, ImportRowError, ImportResult
+from metrics import registry
+from rollups import add_to_rollups
+
+CSV_MEDIA_TYPE = "text/csv"
+IMPORT_MAX_ERRORS = 1000
+
+_imported = registry.counter("budget_import_rows_total")
+_rejected = registry.counter("budget_import_errors_total")
+
+
+def write_concern(value: str, journal: bool) -> WriteConcern:
+    return WriteConcern(w=int(value) if value.isdigit() else value, j=journal)
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[list[str]]:
+    """
+    Разбивает поток байтов UTF-8 на строки, не дожидаясь конца загрузки
+
+    Строки отдаются списками по мере прихода фрагментов тела запроса
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    tail = ""
+    async for chunk in stream:
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        if lines:
+            yield lines
+
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield [tail]
+
+
+async def iter_records(request: Request) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    Отдает строки загрузки с номерами: словари для CSV с заголовком,
+    исходные строки JSON для NDJSON. Пустые строки пропускаются
+    """
+    is_csv = request.headers.get("content-type", "").startswith(CSV_MEDIA_TYPE)
+    fieldnames = None
+
+    line_no = 0
+    async for lines in iter_lines(request.stream()):
+        if not is_csv:
+            for line in lines:
+                line_no += 1
+                if line.strip():
+                    yield line_no, line
+            continue
+
+        for values in csv.reader(lines):
+            line_no += 1
+            if not values:
+                continue
+            if fieldnames is None:
+                fieldnames = values
+                continue
+            yield line_no, {
+                name: value for name, value in zip(fieldnames, values) if value
+            }
+
+
+class Importer:
+    """
+    Импорт записей одного пользователя пачками
+
+    Строки проверяются по мере чтения загрузки, проверенные записи копятся
+    до batch_size и вставляются неупорядоченным insert_many. Пока пачка пишется
+    в MongoDB, читается и проверяется следующая
+    """
+
+    def __init__(
+        self,
+        collection: AsyncCollection,
+        rollups: AsyncCollection,
+        model: type[BudgetData],
+        kind: EntryKind,
+        user_id: int,
+        batch_size: int,
+        concern: WriteConcern,
+    ):
+        self._collection = collection.with_options(write_concern=concern)
+        self._rollups = rollups
+        self._model = model
+        self._kind = kind
+        self._user_id = user_id
+        self._batch_size = batch_size
+
+        self._received = 0
+        self._inserted = 0
+        self._failed = 0
+        self._errors: list[ImportRowError] = []
+
+    def _reject(self, line: int, detail):
+        self._failed += 1
+        _rejected.inc()
+        if len(self._errors) < IMPORT_MAX_ERRORS:
+            self._errors.append(ImportRowError(line=line, detail=detail))
+
+    def _validate(self, line: int, record: dict | str) -> BudgetData | None:
+        try:
+            if isinstance(record, str):
+                return self._model.model_validate_json(record)
+            return self._model.model_validate(record)
+        except ValidationError as e:
+            self._reject(line, e.errors(include_url=False, include_context=False))
+            return None
+
+    async def _write(self, batch: list[tuple[int, BudgetData]]):
+        docs = [
+            {
+                "_id": ObjectId(),
+                "user_id": self._user_id,
+                **entry.model_dump(),
+            }
+            for _, entry in batch
+        ]
+
+        failed = set()
+        try:
+            await self._collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details["writeErrors"]:
+                failed.add(error["index"])
+                self._reject(batch[error["index"]][0], error["errmsg"])
+
+        inserted = [entry for i, (_, entry) in enumerate(batch) if i not in failed]
+        if inserted:
+            await add_to_rollups(self._rollups, self._user_id, self._kind, inserted)
+        self._inserted += len(inserted)
+        _imported.inc(len(inserted))
+
+    async def run(self, records: AsyncIterator[tuple[int, dict | str]]) -> ImportResult:
+        started = time.perf_counter()
+        pending: asyncio.Task | None = None
+        batch: list[tuple[int, BudgetData]] = []
+
+        try:
+            async for line, record in records:
+                self._received += 1
+                entry = self._validate(line, record)
+                if entry is None:
+                    continue
+
+                batch.append((line, entry))
+                if len(batch) >= self._batch_size:
+                    if pending is not None:
+                        await pending
+                    pending = asyncio.create_task(self._write(batch))
+                    batch = []
+
+            if pending is not None:
+                await pending
+                pending = None
+            if batch:
+                await self._write(batch)
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+        seconds = time.perf_counter() - started
+        return ImportResult(
+            received=self._received,
+            inserted=self._inserted,
+            failed=self._failed,
+            errors=self._errors,
+            seconds=round(seconds, 3),
+            rows_per_second=round(self._received / seconds) if seconds else 0,
+        )
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from itertools import groupby
+from typing import NewType
+
+from pymongo import UpdateOne
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import BulkWriteError, WriteError
+from pymongo.write_concern import WriteConcern
+
+from db.models import EntryKind, ExpenseInDB, IncomeInDB
+from metrics import registry
+from rollups import add_to_rollups, rollup_updates
+
+type Entry = IncomeInDB | ExpenseInDB
+
+_batches = registry.counter("insert_batches_total")
+_batched = registry.counter("insert_batched_docs_total")
+_flush_latency = registry.latency("insert_batch_write_seconds")
+
+
+class EntryWriter:
+    """
+    Добавление отдельных доходов или расходов с групповой записью
+
+    При batch_size больше 1 записи параллельных запросов копятся не дольше
+    linger секунд или до batch_size штук и вставляются одним неупорядоченным
+    insert_many, итоги всей пачки обновляются одним bulk_write. Запрос
+    завершается, когда MongoDB подтвердила запись его документа. При batch_size 1
+    каждая запись вставляется отдельно, как раньше
+    """
+
+    def __init__(
+        self,
+        collection: AsyncCollection,
+        rollups: AsyncCollection,
+        kind: EntryKind,
+        batch_size: int,
+        linger: float,
+        concern: WriteConcern,
+    ):
+        self._collection = collection
+        self._batch_collection = collection.with_options(write_concern=concern)
+        self._rollups = rollups
+        self._kind = kind
+        self._batch_size = batch_size
+        self._linger = linger
+
+        self._pending: list[tuple[Entry, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._writes: set[asyncio.Task] = set()
+
+    @property
+    def batching(self) -> bool:
+        return self._batch_size > 1
+
+    async def add(self, entry: Entry):
+        """
+        Сохраняет запись пользователя и учитывает ее в итогах
+        """
+        if not self.batching:
+            await self._collection.insert_one(entry.model_dump(by_alias=True))
+            await add_to_rollups(self._rollups, entry.user_id, self._kind, [entry])
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((entry, future))
+        if len(self._pending) >= self._batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self._linger, self._flush
+            )
+        await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._write(batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    @staticmethod
+    def _resolve(batch: list[tuple[Entry, asyncio.Future]], error=None):
+        for _, future in batch:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    async def _insert(
+        self, batch: list[tuple[Entry, asyncio.Future]]
+    ) -> list[tuple[Entry, asyncio.Future]]:
+        started = time.perf_counter()
+        try:
+            await self._batch_collection.insert_many(
+                [entry.model_dump(by_alias=True) for entry, _ in batch], ordered=False
+            )
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                raise
+            failed = set()
+            for error in e.details["writeErrors"]:
+                failed.add(error["index"])
+                self._resolve(
+                    [batch[error["index"]]],
+                    WriteError(error["errmsg"], error["code"], error),
+                )
+            return [item for i, item in enumerate(batch) if i not in failed]
+        finally:
+            _batches.inc()
+            _batched.inc(len(batch))
+            _flush_latency.observe(time.perf_counter() - started)
+        return batch
+
+    async def _write(self, batch: list[tuple[Entry, asyncio.Future]]):
+        try:
+            inserted = await self._insert(batch)
+            if inserted:
+                await self._rollups.bulk_write(
+                    self._rollup_updates([entry for entry, _ in inserted]),
+                    ordered=False,
+                )
+        except Exception as e:
+            self._resolve(batch, e)
+        else:
+            self._resolve(batch)
+
+    def _rollup_updates(self, entries: list[Entry]) -> list[UpdateOne]:
+        entries.sort(key=lambda entry: entry.user_id)
+        return [
+            update
+            for user_id, user_entries in groupby(entries, lambda entry: entry.user_id)
+            for update in rollup_updates(user_id, self._kind, user_entries)
+        ]
+
+    async def close(self):
+        """
+        Записывает накопленные записи и дожидается незавершенных вставок
+        """
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+
+IncomeWriter = NewType("IncomeWriter", EntryWriter)
+ExpenseWriter = NewType("ExpenseWriter", EntryWriter)
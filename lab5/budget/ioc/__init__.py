@@ -7,5 +7,10 @@ from . import providers
 container = make_async_container(
     providers.AppProvider(),
     providers.RedisProvider(),
+    providers.MongoProvider(),
+    providers.RatesProvider(),
+    providers.CacheProvider(),
+    providers.WriterProvider(),
+    providers.AuthProvider(),
     context={config.Settings: config.settings},
 )
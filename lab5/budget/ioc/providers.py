@@ -1,9 +1,32 @@
+import asyncio
+from contextlib import suppress
 from typing import Annotated, AsyncIterator
 
 import redis.asyncio as redis
 from dishka import FromComponent, Provider, Scope, from_context, provide
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 
 import config
+from db.models import EntryKind
+from db.mongo import (
+    EXPENSE_COLLECTION,
+    INCOME_COLLECTION,
+    RATE_COLLECTION,
+    ROLLUP_COLLECTION,
+    ExpenseCollection,
+    IncomeCollection,
+    RateCollection,
+    RollupCollection,
+)
+from importing import write_concern
+from inserting import EntryWriter, ExpenseWriter, IncomeWriter
+from metrics import registry
+from list_cache import ListCache
+from rates import RateTable
+from sessions import SessionCache, listen_revocations
+from tokens import TokenVerifier
 
 
 class AppProvider(Provider):
@@ -25,31 +48,272 @@ class RedisProvider(Provider):
         Является зависимостью для получения устройства доступа и не предназначен для вызова извне
         """
 
-        redis_pool = redis.ConnectionPool.from_url(
-            f"rediss://:{settings.redis_password}@{settings.redis_host}:{settings.redis_port}",
+        redis_pool = redis.BlockingConnectionPool.from_url(
+            f"redis://:{settings.redis_password}@{settings.redis_host}:{settings.redis_port}",
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            health_check_interval=settings.redis_health_check_interval,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout,
         )
 
+        registry.callback(
+            "redis_pool_in_use", lambda: len(redis_pool._in_use_connections)
+        )
+        registry.callback(
+            "redis_pool_available", lambda: len(redis_pool._available_connections)
+        )
+        registry.callback("redis_pool_max", lambda: redis_pool.max_connections)
+
         yield redis_pool
 
         await redis_pool.aclose()
 
-    @provide(scope=Scope.REQUEST)
+    @provide(scope=Scope.APP)
     async def get_redis_client(
         self,
         redis_pool: redis.ConnectionPool,
-        settings: Annotated[config.Settings, FromComponent("AppProvider")],
     ) -> AsyncIterator[redis.Redis]:
         """
-        Провайдер, поставляющий устройства доступа для обращения в БД Редис
+        Провайдер, поставляющий устройство доступа для обращения в БД Редис
+        Устройство общее для всего приложения и берет подключения из пула
         Используется извне
         """
 
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-        )
+        redis_client = redis.Redis(connection_pool=redis_pool)
 
         yield redis_client
 
         await redis_client.aclose()
+
+
+class MongoProvider(Provider):
+    component = "MongoProvider"
+
+    @provide(scope=Scope.APP)
+    async def _init_mongo_client(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+    ) -> AsyncIterator[AsyncMongoClient]:
+        """
+        Провайдер, поставляющий асинхронный клиент MongoDB с пулом подключений
+        Является зависимостью для получения БД и не предназначен для вызова извне
+        """
+
+        mongo_client = AsyncMongoClient(
+            settings.mongo_url,
+            maxPoolSize=settings.mongo_max_pool_size,
+            minPoolSize=settings.mongo_min_pool_size,
+            maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+            connectTimeoutMS=settings.mongo_connect_timeout_ms,
+            serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+            timeoutMS=settings.mongo_timeout_ms,
+            tz_aware=True,
+        )
+
+        yield mongo_client
+
+        await mongo_client.close()
+
+    @provide(scope=Scope.APP)
+    def get_database(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        mongo_client: AsyncMongoClient,
+    ) -> AsyncDatabase:
+        """
+        Провайдер, поставляющий БД MongoDB сервиса
+        Используется извне
+        """
+
+        return mongo_client[settings.mongo_db]
+
+    @provide(scope=Scope.APP)
+    def get_income_collection(self, db: AsyncDatabase) -> IncomeCollection:
+        """
+        Провайдер, поставляющий коллекцию доходов
+        Используется извне
+        """
+
+        return IncomeCollection(db[INCOME_COLLECTION])
+
+    @provide(scope=Scope.APP)
+    def get_expense_collection(self, db: AsyncDatabase) -> ExpenseCollection:
+        """
+        Провайдер, поставляющий коллекцию расходов
+        Используется извне
+        """
+
+        return ExpenseCollection(db[EXPENSE_COLLECTION])
+
+    @provide(scope=Scope.APP)
+    def get_rollup_collection(self, db: AsyncDatabase) -> RollupCollection:
+        """
+        Провайдер, поставляющий коллекцию итогов пользователей
+        Используется извне
+        """
+
+        return RollupCollection(db[ROLLUP_COLLECTION])
+
+    @provide(scope=Scope.APP)
+    def get_rate_collection(self, db: AsyncDatabase) -> RateCollection:
+        """
+        Провайдер, поставляющий коллекцию курсов валют
+        Используется извне
+        """
+
+        return RateCollection(db[RATE_COLLECTION])
+
+
+class RatesProvider(Provider):
+    component = "RatesProvider"
+
+    @provide(scope=Scope.APP)
+    def get_rate_table(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        rate_collection: Annotated[RateCollection, FromComponent("MongoProvider")],
+        redis_client: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    ) -> RateTable:
+        """
+        Провайдер, поставляющий кэш таблицы курсов валют процесса
+        Используется извне
+        """
+
+        return RateTable(
+            collection=rate_collection,
+            redis_con=redis_client,
+            refresh_interval=settings.rates_refresh_interval,
+        )
+
+
+class CacheProvider(Provider):
+    component = "CacheProvider"
+
+    @provide(scope=Scope.APP)
+    def get_list_cache(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        redis_client: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    ) -> ListCache:
+        """
+        Провайдер, поставляющий кэш страниц списков доходов и расходов
+        Используется извне
+        """
+
+        return ListCache(redis_con=redis_client, ttl=settings.list_cache_ttl)
+
+
+class WriterProvider(Provider):
+    component = "WriterProvider"
+
+    @provide(scope=Scope.APP)
+    async def get_income_writer(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        income_collection: Annotated[IncomeCollection, FromComponent("MongoProvider")],
+        rollups: Annotated[RollupCollection, FromComponent("MongoProvider")],
+    ) -> AsyncIterator[IncomeWriter]:
+        """
+        Провайдер, поставляющий запись отдельных доходов
+        Накопленные записи сохраняются при остановке приложения
+        Используется извне
+        """
+
+        writer = _init_entry_writer(
+            settings, income_collection, rollups, EntryKind.INCOME
+        )
+
+        yield IncomeWriter(writer)
+
+        await writer.close()
+
+    @provide(scope=Scope.APP)
+    async def get_expense_writer(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        expense_collection: Annotated[
+            ExpenseCollection, FromComponent("MongoProvider")
+        ],
+        rollups: Annotated[RollupCollection, FromComponent("MongoProvider")],
+    ) -> AsyncIterator[ExpenseWriter]:
+        """
+        Провайдер, поставляющий запись отдельных расходов
+        Накопленные записи сохраняются при остановке приложения
+        Используется извне
+        """
+
+        writer = _init_entry_writer(
+            settings, expense_collection, rollups, EntryKind.EXPENSE
+        )
+
+        yield ExpenseWriter(writer)
+
+        await writer.close()
+
+
+def _init_entry_writer(
+    settings: config.Settings,
+    collection: AsyncCollection,
+    rollups: AsyncCollection,
+    kind: EntryKind,
+) -> EntryWriter:
+    return EntryWriter(
+        collection=collection,
+        rollups=rollups,
+        kind=kind,
+        batch_size=settings.insert_batch_size,
+        linger=settings.insert_linger_ms / 1000,
+        concern=write_concern(
+            settings.insert_write_concern, settings.insert_write_journal
+        ),
+    )
+
+
+class AuthProvider(Provider):
+    component = "AuthProvider"
+
+    @provide(scope=Scope.APP)
+    async def get_token_verifier(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        redis_client: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    ) -> AsyncIterator[TokenVerifier]:
+        """
+        Провайдер, поставляющий проверку токенов сервиса авторизации
+        Используется извне
+        """
+
+        token_verifier = TokenVerifier(
+            jwks_url=settings.auth_jwks_url,
+            jwks_ttl=settings.auth_jwks_ttl,
+            redis_con=redis_client,
+            check_revocation=settings.auth_check_revocation,
+        )
+
+        yield token_verifier
+
+        await token_verifier.close()
+
+    @provide(scope=Scope.APP)
+    async def get_session_cache(
+        self,
+        settings: Annotated[config.Settings, FromComponent("AppProvider")],
+        redis_client: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    ) -> AsyncIterator[SessionCache]:
+        """
+        Провайдер, поставляющий кэш проверенных токенов процесса
+        Кэш сбрасывается по сообщениям из канала отзыва токенов
+        Используется извне
+        """
+
+        session_cache = SessionCache(
+            maxsize=settings.session_cache_size, ttl=settings.session_cache_ttl
+        )
+        listener = asyncio.create_task(listen_revocations(redis_client, session_cache))
+
+        yield session_cache
+
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
@@ -0,0 +1,102 @@
+import redis.asyncio as redis
+
+from db.models import EntryKind, ListQuery
+from listing import query_digest
+from metrics import registry
+from versions import data_version_key, get_data_version, new_epoch
+
+# Версия данных и закэшированный ответ читаются за один запрос к Редис.
+# Оба ключа передаются в KEYS, версию ответа сверяет клиент. Отсутствующая
+# версия создается с новой эпохой, как в versions.get_data_version
+_GET_SCRIPT = """
+local version = redis.call('GET', KEYS[1])
+if not version then
+    version = '0.' .. ARGV[1]
+    redis.call('SET', KEYS[1], version)
+end
+return {version, redis.call('GET', KEYS[2])}
+"""
+
+# Ответ сохраняется, только если версия, для которой он построен, еще текущая:
+# запрос, закончившийся позже записи, не заменит более новую страницу
+_SET_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[1] .. '\\n' .. ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+class ListCache:
+    """
+    Кэш ответов списков доходов и расходов в Редис
+
+    Ответ хранится вместе с версией данных пользователя, для которой он
+    построен, и записывается, только пока эта версия текущая. Добавление
+    записей меняет версию, поэтому старые ответы больше не отдаются
+    и перезаписываются или удаляются Редис по истечении ttl
+    """
+
+    def __init__(self, redis_con: redis.Redis, ttl: int):
+        self._redis = redis_con
+        self._ttl = ttl
+        self._get = redis_con.register_script(_GET_SCRIPT)
+        self._set = redis_con.register_script(_SET_SCRIPT)
+
+        self._hits = registry.counter("list_cache_hits_total")
+        self._misses = registry.counter("list_cache_misses_total")
+        registry.callback("list_cache_hit_ratio", self._hit_ratio)
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl > 0
+
+    def _hit_ratio(self) -> float:
+        total = self._hits.value + self._misses.value
+        return round(self._hits.value / total, 4) if total else 0.0
+
+    @staticmethod
+    def _key(kind: EntryKind, user_id: int, query: ListQuery) -> str:
+        # Хеш-тег с именем ключа версии кладет оба ключа в один слот Redis Cluster
+        tag = data_version_key(user_id)
+        return f"budget:list:{kind.value}:{{{tag}}}:{query_digest(query)}"
+
+    async def get(
+        self, kind: EntryKind, user_id: int, query: ListQuery
+    ) -> tuple[str, bytes | None]:
+        """
+        Возвращает текущую версию данных пользователя и ответ для нее, если он есть
+        При выключенном кэше возвращается только версия
+        """
+        if not self.enabled:
+            return await get_data_version(self._redis, user_id), None
+
+        version, cached = await self._get(
+            keys=[data_version_key(user_id), self._key(kind, user_id, query)],
+            args=[new_epoch()],
+        )
+        version = version.decode()
+        if cached is not None:
+            cached_version, cached = cached.split(b"\n", 1)
+            if cached_version.decode() != version:
+                cached = None
+
+        if cached is None:
+            self._misses.inc()
+        else:
+            self._hits.inc()
+        return version, cached
+
+    async def set(
+        self,
+        kind: EntryKind,
+        user_id: int,
+        query: ListQuery,
+        version: str,
+        value: bytes,
+    ):
+        await self._set(
+            keys=[data_version_key(user_id), self._key(kind, user_id, query)],
+            args=[version, value, self._ttl],
+        )
@@ -0,0 +1,159 @@
+import base64
+import hashlib
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from bson import json_util
+from fastapi import Request
+from pydantic_core import to_json
+from pymongo.asynchronous.cursor import AsyncCursor
+
+from db.models import EntryKind, ListQuery
+from metrics import registry
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Списки читают только поля ответа и _id для курсора. Все они есть в индексах
+# списков из create_indexes, поэтому запрос покрывается индексом
+# и сами документы коллекции не читаются
+LIST_PROJECTION = {"_id": 1, "amount": 1, "currency": 1, "date": 1}
+STREAM_PROJECTION = {"_id": 0, "amount": 1, "currency": 1, "date": 1}
+
+_streamed = registry.counter("budget_stream_documents_total")
+
+
+def _entry(doc: dict) -> dict:
+    # Записи до появления даты (см. db.backfill_dates) получают текущее время,
+    # как при проверке моделью
+    date = doc.get("date") or datetime.now(timezone.utc)
+    return {"amount": doc["amount"], "currency": doc["currency"], "date": date}
+
+
+def dump_entries(docs: list[dict]) -> bytes:
+    """
+    Кодирует документы MongoDB в JSON ответа без построения моделей
+
+    Формат совпадает с IncomeData и ExpenseData: в базу записи попадают
+    только после проверки моделью, поэтому повторно они не проверяются
+    """
+    return to_json([_entry(doc) for doc in docs])
+
+
+def query_digest(query: ListQuery) -> str:
+    return hashlib.sha1(query.model_dump_json().encode()).hexdigest()
+
+
+def make_etag(kind: EntryKind, user_id: int, version: str, query: ListQuery) -> str:
+    """
+    Строгий ETag страницы: одинаковые параметры при одной версии данных
+    пользователя всегда дают одинаковый ответ. Версия содержит случайную эпоху,
+    поэтому откат счетчика в Редис не дает совпадения со старым ETag
+    """
+    return f'"{kind.value}-{user_id}-{version}-{query_digest(query)[:16]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def encode_cursor(doc: dict) -> str:
+    """
+    Упаковывает ключ последнего документа страницы в непрозрачный курсор
+    """
+    key = json_util.dumps({"id": doc["_id"]}).encode()
+    return base64.urlsafe_b64encode(key).decode()
+
+
+def decode_cursor(cursor: str):
+    """
+    Возвращает ключ документа, после которого начинается страница,
+    при испорченном курсоре выбрасывает ValueError
+    """
+    try:
+        return json_util.loads(base64.urlsafe_b64decode(cursor))["id"]
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def build_filter(user_id: int, query: ListQuery) -> dict:
+    """
+    Собирает фильтр списка доходов или расходов
+
+    Документы перебираются по возрастанию _id. Каждая форма фильтра
+    обслуживается составным индексом из create_indexes: сначала равенства,
+    затем ключ сортировки, затем диапазоны
+
+    ObjectId растет со временем создания только с точностью до секунды:
+    записи, созданные в ту же секунду другим процессом или вставленные
+    с задержкой (групповая запись, импорт), могут оказаться позади курсора
+    и не попасть на следующие страницы уже начатого перебора
+
+    Строковые _id, оставшиеся до db.migrate_ids, сортируются раньше ObjectId,
+    а $gt сравнивает значения только одного типа. Поэтому после строкового
+    курсора перебор продолжается и по всем ObjectId
+    """
+    conditions: dict = {"user_id": user_id}
+    if query.currency is not None:
+        conditions["currency"] = query.currency.value
+    if query.cursor is not None:
+        after = decode_cursor(query.cursor)
+        if isinstance(after, str):
+            conditions["$or"] = [
+                {"_id": {"$gt": after}},
+                {"_id": {"$type": "objectId"}},
+            ]
+        else:
+            conditions["_id"] = {"$gt": after}
+
+    amount = {}
+    if query.amount_min is not None:
+        amount["$gte"] = query.amount_min
+    if query.amount_max is not None:
+        amount["$lte"] = query.amount_max
+    if amount:
+        conditions["amount"] = amount
+
+    date = {}
+    if query.date_from is not None:
+        date["$gte"] = query.date_from
+    if query.date_to is not None:
+        date["$lt"] = query.date_to
+    if date:
+        conditions["date"] = date
+
+    return conditions
+
+
+async def iter_ndjson(cursor: AsyncCursor, batch_size: int) -> AsyncIterator[bytes]:
+    """
+    Отдает документы курсора в NDJSON пачками по batch_size строк
+
+    Следующая пачка читается из MongoDB только после того, как предыдущая
+    отправлена клиенту, поэтому в памяти держится не больше одной пачки
+    """
+    try:
+        lines = []
+        async for doc in cursor:
+            lines.append(to_json(_entry(doc)))
+            if len(lines) >= batch_size:
+                _streamed.inc(len(lines))
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+
+        if lines:
+            _streamed.inc(len(lines))
+            yield b"\n".join(lines) + b"\n"
+    finally:
+        await cursor.close()
@@ -1,143 +1,487 @@
+from datetime import date, datetime, timezone
 from typing import Annotated
-from uuid import uuid4
 
 import redis.asyncio as redis
 from dishka import FromComponent
-from fastapi import FastAPI, Header, HTTPException, status
+from fastapi import (
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+from pymongo import ASCENDING
+from pymongo.asynchronous.collection import AsyncCollection
 from dishka.integrations.fastapi import inject, setup_dishka
+from jwt.exceptions import InvalidTokenError
+from pymongo.asynchronous.database import AsyncDatabase
 
-from db.mongo import income_collection, expense_collection, create_indexes
+from db.mongo import ExpenseCollection, IncomeCollection, RollupCollection
 from db.models import (
+    Balance,
+    Bucket,
+    BudgetDynamics,
     CommonHeaders,
+    Currency,
+    EntryKind,
     IncomeData,
+    ListQuery,
     SessionUser,
     IncomeInDB,
     ExpenseData,
     ExpenseInDB,
+    ImportResult,
+    ReportJob,
+    ReportParams,
+    UtcDatetime,
 )
 from db.seed import seed_data
+from dynamics import get_dynamics
+from importing import Importer, iter_records, write_concern
+from inserting import ExpenseWriter, IncomeWriter
+from list_cache import ListCache
+from listing import (
+    LIST_PROJECTION,
+    NDJSON_MEDIA_TYPE,
+    NEXT_CURSOR_HEADER,
+    STREAM_PROJECTION,
+    build_filter,
+    dump_entries,
+    encode_cursor,
+    etag_matches,
+    iter_ndjson,
+    make_etag,
+    wants_ndjson,
+)
+from metrics import registry
+from rates import RateTable, RatesUnavailableError, convert_balance, convert_dynamics
+from reports import get_report, submit_report
+from rollups import TOTAL_PERIOD, get_balance
+from sessions import SessionCache
+from tokens import TokenVerifier
+from versions import bump_data_version
+import config
 import ioc
 
-
 type Username = str
 
+LIST_PAGE_LIMIT = 100
+
 
 app = FastAPI()
 setup_dishka(ioc.container, app)
 
 
 @app.on_event("startup")
-def startup_event():
-    create_indexes()
-    seed_data()
+async def startup_event():
+    db = await app.state.dishka_container.get(AsyncDatabase, component="MongoProvider")
+    await seed_data(db)
+
+
+@app.exception_handler(RatesUnavailableError)
+async def rates_unavailable_handler(request: Request, exc: RatesUnavailableError):
+    return JSONResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={"detail": f"Нет курсов для валюты {exc}"},
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await app.state.dishka_container.close()
 
 
-@app.post("/income")
 @inject
-async def add_income(
+async def get_session_user(
     headers: Annotated[CommonHeaders, Header()],
-    income: IncomeData,
-    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
-) -> IncomeData:
+    token_verifier: Annotated[TokenVerifier, FromComponent("AuthProvider")],
+    session_cache: Annotated[SessionCache, FromComponent("AuthProvider")],
+) -> SessionUser:
     """
-    Ручка для добавления дохода
+    Зависимость, возвращающая пользователя по токену из заголовка Authorization
+
+    Проверенные токены кэшируются в процессе
     """
     try:
         _, token = headers.authorization.split(maxsplit=1)
     except ValueError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-    session = await redis_con.get(token)
+    user_info = session_cache.get(token)
+    if user_info is not None:
+        return user_info
 
-    if session is None:
+    try:
+        user_info, claims = await token_verifier.verify(token)
+    except InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-    user_info = SessionUser.model_validate_json(session)
+    session_cache.set(token, user_info, claims["jti"], claims["exp"])
+    return user_info
 
-    income = IncomeInDB(
-        _id=str(uuid4()), user_id=user_info.user_id, **income.model_dump()
-    )
-    result = income_collection.insert_one(income.model_dump(by_alias=True))
-    income.id = str(result.inserted_id)
+
+async def list_entries(
+    request: Request,
+    collection: AsyncCollection,
+    kind: EntryKind,
+    user_id: int,
+    query: ListQuery,
+    settings: config.Settings,
+    list_cache: ListCache,
+):
+    """
+    Возвращает страницу доходов или расходов пользователя
+
+    Записи отсортированы по _id и фильтруются по валюте и диапазону суммы.
+    Если записей больше limit, в заголовке X-Next-Cursor возвращается курсор,
+    который передается в cursor для получения следующей страницы
+
+    С заголовком Accept: application/x-ndjson список отдается потоком в NDJSON,
+    по умолчанию без ограничения количества записей
+
+    Страницы в JSON кэшируются в Редис по версии данных пользователя.
+    ETag страницы строится по той же версии, поэтому на If-None-Match
+    ответ 304 отдается без обращения к MongoDB
+    """
+    try:
+        conditions = build_filter(user_id, query)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+    if wants_ndjson(request):
+        results = collection.find(
+            conditions,
+            STREAM_PROJECTION,
+            batch_size=settings.list_stream_batch_size,
+        ).sort("_id", ASCENDING)
+        if query.limit is not None:
+            results = results.limit(query.limit)
+        return StreamingResponse(
+            iter_ndjson(results, settings.list_stream_batch_size),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    version, cached = await list_cache.get(kind, user_id, query)
+    etag = make_etag(kind, user_id, version, query)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag)
+        )
+
+    if cached is not None:
+        next_cursor, body = cached.split(b"\n", 1)
+        return page_response(body, next_cursor.decode(), etag)
+
+    limit = query.limit or LIST_PAGE_LIMIT
+    results = collection.find(conditions, LIST_PROJECTION).sort("_id", ASCENDING)
+    docs = await results.limit(limit + 1).to_list()
+
+    next_cursor = ""
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+
+    body = dump_entries(docs)
+    if list_cache.enabled:
+        value = next_cursor.encode() + b"\n" + body
+        await list_cache.set(kind, user_id, query, version, value)
+
+    return page_response(body, next_cursor, etag)
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def page_response(body: bytes, next_cursor: str, etag: str) -> Response:
+    headers = cache_headers(etag)
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/metrics")
+async def get_metrics() -> dict:
+    """
+    Ручка для получения метрик сервиса
+    """
+    return registry.snapshot()
+
+
+@app.post("/income")
+@inject
+async def add_income(
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
+    income: IncomeData,
+    income_writer: Annotated[IncomeWriter, FromComponent("WriterProvider")],
+    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+) -> IncomeData:
+    """
+    Ручка для добавления дохода
+
+    При INSERT_BATCH_SIZE больше 1 доходы параллельных запросов
+    записываются в MongoDB группами
+    """
+    income = IncomeInDB(user_id=user_info.user_id, **income.model_dump())
+    await income_writer.add(income)
+    await bump_data_version(redis_con, user_info.user_id)
     return income
 
 
 @app.get("/income")
 @inject
 async def get_income(
-    headers: Annotated[CommonHeaders, Header()],
-    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    request: Request,
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
+    income_collection: Annotated[IncomeCollection, FromComponent("MongoProvider")],
+    settings: Annotated[config.Settings, FromComponent("AppProvider")],
+    list_cache: Annotated[ListCache, FromComponent("CacheProvider")],
+    query: Annotated[ListQuery, Query()],
 ) -> list[IncomeData]:
     """
     Ручка для получения доходов
-    """
-    try:
-        _, token = headers.authorization.split(maxsplit=1)
-    except ValueError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-
-    session = await redis_con.get(token)
 
-    if session is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    Записи отдаются постранично, курсор следующей страницы - в заголовке
+    X-Next-Cursor. С заголовком Accept: application/x-ndjson список
+    отдается потоком в NDJSON
+    """
+    return await list_entries(
+        request,
+        income_collection,
+        EntryKind.INCOME,
+        user_info.user_id,
+        query,
+        settings,
+        list_cache,
+    )
 
-    user_info = SessionUser.model_validate_json(session)
 
-    results = income_collection.find({"user_id": user_info.user_id})
+@app.post("/income/import")
+@inject
+async def import_income(
+    request: Request,
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
+    income_collection: Annotated[IncomeCollection, FromComponent("MongoProvider")],
+    rollups: Annotated[RollupCollection, FromComponent("MongoProvider")],
+    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    settings: Annotated[config.Settings, FromComponent("AppProvider")],
+) -> ImportResult:
+    """
+    Ручка для импорта доходов
 
-    return [IncomeData(**doc) for doc in results]
+    Принимает CSV с заголовком (Content-Type: text/csv) или NDJSON
+    с полями amount, currency и date. Возвращает количество добавленных
+    записей, ошибки по номерам строк и скорость импорта
+    """
+    importer = Importer(
+        income_collection,
+        rollups,
+        IncomeData,
+        EntryKind.INCOME,
+        user_info.user_id,
+        settings.import_batch_size,
+        write_concern(settings.import_write_concern, settings.import_write_journal),
+    )
+    try:
+        return await importer.run(iter_records(request))
+    finally:
+        await bump_data_version(redis_con, user_info.user_id)
 
 
 @app.post("/expenses")
 @inject
 async def add_expense(
-    headers: Annotated[CommonHeaders, Header()],
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
     expense: ExpenseData,
+    expense_writer: Annotated[ExpenseWriter, FromComponent("WriterProvider")],
     redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
 ) -> ExpenseData:
     """
     Ручка для добавления расхода
-    """
-    try:
-        _, token = headers.authorization.split(maxsplit=1)
-    except ValueError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-
-    session = await redis_con.get(token)
-
-    if session is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-    user_info = SessionUser.model_validate_json(session)
-
-    expense_doc = ExpenseInDB(
-        _id=str(uuid4()), user_id=user_info.user_id, **expense.model_dump()
-    )
-    result = expense_collection.insert_one(expense_doc.model_dump(by_alias=True))
-    expense_doc.id = str(result.inserted_id)
+    При INSERT_BATCH_SIZE больше 1 расходы параллельных запросов
+    записываются в MongoDB группами
+    """
+    expense_doc = ExpenseInDB(user_id=user_info.user_id, **expense.model_dump())
+    await expense_writer.add(expense_doc)
+    await bump_data_version(redis_con, user_info.user_id)
     return expense_doc
 
 
 @app.get("/expenses")
 @inject
 async def get_expenses(
-    headers: Annotated[CommonHeaders, Header()],
-    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    request: Request,
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
+    expense_collection: Annotated[ExpenseCollection, FromComponent("MongoProvider")],
+    settings: Annotated[config.Settings, FromComponent("AppProvider")],
+    list_cache: Annotated[ListCache, FromComponent("CacheProvider")],
+    query: Annotated[ListQuery, Query()],
 ) -> list[ExpenseData]:
     """
     Ручка для получения расходов
+
+    Записи отдаются постранично, курсор следующей страницы - в заголовке
+    X-Next-Cursor. С заголовком Accept: application/x-ndjson список
+    отдается потоком в NDJSON
     """
+    return await list_entries(
+        request,
+        expense_collection,
+        EntryKind.EXPENSE,
+        user_info.user_id,
+        query,
+        settings,
+        list_cache,
+    )
+
+
+@app.post("/expenses/import")
+@inject
+async def import_expenses(
+    request: Request,
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
+    expense_collection: Annotated[ExpenseCollection, FromComponent("MongoProvider")],
+    rollups: Annotated[RollupCollection, FromComponent("MongoProvider")],
+    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    settings: Annotated[config.Settings, FromComponent("AppProvider")],
+) -> ImportResult:
+    """
+    Ручка для импорта расходов
+
+    Принимает CSV с заголовком (Content-Type: text/csv) или NDJSON
+    с полями amount, currency и date. Возвращает количество добавленных
+    записей, ошибки по номерам строк и скорость импорта
+    """
+    importer = Importer(
+        expense_collection,
+        rollups,
+        ExpenseData,
+        EntryKind.EXPENSE,
+        user_info.user_id,
+        settings.import_batch_size,
+        write_concern(settings.import_write_concern, settings.import_write_journal),
+    )
     try:
-        _, token = headers.authorization.split(maxsplit=1)
-    except ValueError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        return await importer.run(iter_records(request))
+    finally:
+        await bump_data_version(redis_con, user_info.user_id)
 
-    session = await redis_con.get(token)
 
-    if session is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+@app.get("/budget/dynamics")
+@inject
+async def get_budget_dynamics(
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
+    db: Annotated[AsyncDatabase, FromComponent("MongoProvider")],
+    date_from: Annotated[UtcDatetime, Query(alias="from")],
+    date_to: Annotated[UtcDatetime, Query(alias="to")],
+    rate_table: Annotated[RateTable, FromComponent("RatesProvider")],
+    bucket: Bucket = Bucket.MONTH,
+    convert_to: Currency | None = None,
+) -> BudgetDynamics:
+    """
+    Ручка для получения динамики бюджета за период [from, to)
 
-    user_info = SessionUser.model_validate_json(session)
+    Возвращает доходы, расходы и их разницу по дням, неделям или месяцам
+    отдельно для каждой валюты. С convert_to дополнительно возвращается
+    общий ряд в этой валюте по курсам на начало каждого периода
+    """
+    if date_from >= date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Period start must be before its end",
+        )
+
+    dynamics = await get_dynamics(db, user_info.user_id, date_from, date_to, bucket)
+    if convert_to is not None:
+        rates = await rate_table.get()
+        dynamics.converted = convert_dynamics(dynamics, rates, convert_to)
+
+    return dynamics
+
+
+def valuation_day(month: str | None) -> date:
+    """
+    День, по курсу которого пересчитываются итоги: конец месяца или сегодня
+    """
+    today = datetime.now(timezone.utc).date()
+    if month is None:
+        return today
+
+    year, month_no = map(int, month.split("-"))
+    next_month = date(year + month_no // 12, month_no % 12 + 1, 1)
+    return min(today, date.fromordinal(next_month.toordinal() - 1))
+
+
+@app.get("/balance")
+@inject
+async def get_user_balance(
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
+    rollups: Annotated[RollupCollection, FromComponent("MongoProvider")],
+    rate_table: Annotated[RateTable, FromComponent("RatesProvider")],
+    month: Annotated[str | None, Query(pattern=r"^\d{4}-(0[1-9]|1[0-2])$")] = None,
+    convert_to: Currency | None = None,
+) -> Balance:
+    """
+    Ручка для получения баланса пользователя по валютам
+
+    Без параметров возвращает итоги за все время, с month (YYYY-MM) - за месяц.
+    Итоги обновляются при добавлении доходов и расходов, поэтому записи не читаются
+
+    С convert_to дополнительно возвращаются итоги в этой валюте
+    по текущему курсу, для месяца - по курсу на его конец
+    """
+    balance = await get_balance(rollups, user_info.user_id, month or TOTAL_PERIOD)
+    if convert_to is not None:
+        rates = await rate_table.get()
+        balance.converted = convert_balance(
+            balance, rates, convert_to, valuation_day(month)
+        )
 
-    results = expense_collection.find({"user_id": user_info.user_id})
-    return [ExpenseData(**doc) for doc in results]
+    return balance
+
+
+@app.post("/reports", status_code=status.HTTP_202_ACCEPTED)
+@inject
+async def create_report(
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
+    params: ReportParams,
+    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+    settings: Annotated[config.Settings, FromComponent("AppProvider")],
+) -> ReportJob:
+    """
+    Ручка для заказа отчета о динамике бюджета за период
+
+    Отчет строится сервисом отчетов в фоне, готовность проверяется
+    через GET /reports/{report_id}. Если отчет с теми же параметрами уже
+    построен и новых записей с тех пор не было, возвращается он
+    """
+    return await submit_report(
+        redis_con,
+        user_info.user_id,
+        params,
+        settings.report_ttl,
+        settings.report_job_timeout,
+    )
+
+
+@app.get("/reports/{report_id}")
+@inject
+async def get_report_status(
+    user_info: Annotated[SessionUser, Depends(get_session_user)],
+    report_id: str,
+    redis_con: Annotated[redis.Redis, FromComponent("RedisProvider")],
+) -> ReportJob:
+    """
+    Ручка для получения состояния и результата отчета
+    """
+    job = await get_report(redis_con, user_info.user_id, report_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return job
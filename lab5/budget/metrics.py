@@ -0,0 +1,100 @@
+from collections import deque
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class CallbackGauge:
+    """
+    Значение вычисляется в момент снятия метрик
+    """
+
+    def __init__(self, func):
+        self._func = func
+
+    def snapshot(self):
+        return self._func()
+
+
+class Latency:
+    """
+    Статистика времени выполнения по последним window замерам
+    """
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self._samples.append(seconds)
+
+    def _percentile(self, samples: list[float], q: float) -> float:
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+    def snapshot(self):
+        samples = sorted(self._samples)
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "p50": self._percentile(samples, 0.5),
+            "p99": self._percentile(samples, 0.99),
+            "max": samples[-1] if samples else 0.0,
+        }
+
+
+class Registry:
+    """
+    Реестр метрик процесса, отдается ручкой GET /metrics
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | CallbackGauge | Latency] = {}
+
+    def _get(self, name: str, kind: type):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = kind()
+        return metric
+
+    def counter(self, name: str) -> Counter:
+        return self._get(name, Counter)
+
+    def gauge(self, name: str) -> Gauge:
+        return self._get(name, Gauge)
+
+    def latency(self, name: str) -> Latency:
+        return self._get(name, Latency)
+
+    def callback(self, name: str, func) -> CallbackGauge:
+        metric = self._metrics[name] = CallbackGauge(func)
+        return metric
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+registry = Registry()
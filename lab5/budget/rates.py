@@ -0,0 +1,257 @@
+import asyncio
+import csv
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import redis.asyncio as redis
+from pymongo import ASCENDING, UpdateOne
+from pymongo.asynchronous.collection import AsyncCollection
+
+from db.models import (
+    Balance,
+    BudgetDynamics,
+    ConvertedBalance,
+    ConvertedDynamics,
+    ConvertedPoint,
+    Currency,
+)
+from metrics import registry
+
+BASE_CURRENCY = Currency.RUB
+RATES_VERSION_KEY = "rates:version"
+
+
+class RatesUnavailableError(Exception):
+    """
+    Для валюты нет ни одного курса
+    """
+
+
+def to_days(dates) -> np.ndarray:
+    """
+    Переводит даты в номера дней для поиска курса
+    """
+    return np.array([value.toordinal() for value in dates], dtype=np.int64)
+
+
+class Rates:
+    """
+    Неизменяемый снимок таблицы курсов
+
+    Для каждой валюты хранятся отсортированные номера дней и курсы к базовой
+    валюте (сколько рублей стоит единица валюты). Курс на день - последний
+    известный на эту дату, до первого известного курса берется первый
+    """
+
+    def __init__(self, table: dict[str, tuple[np.ndarray, np.ndarray]]):
+        self._table = table
+
+    def _rates_at(self, currency: str, days: np.ndarray) -> np.ndarray:
+        if currency == BASE_CURRENCY:
+            return np.ones(len(days))
+
+        known = self._table.get(currency)
+        if known is None:
+            raise RatesUnavailableError(currency)
+
+        known_days, known_rates = known
+        index = np.searchsorted(known_days, days, side="right") - 1
+        return known_rates[np.clip(index, 0, len(known_rates) - 1)]
+
+    def convert(
+        self,
+        amounts: np.ndarray,
+        currencies: np.ndarray,
+        days: np.ndarray,
+        target: Currency,
+    ) -> np.ndarray:
+        """
+        Переводит массив сумм в валюту target по курсам на соответствующие дни
+
+        Расчет идет по массивам целиком, отдельно для каждой исходной валюты
+        """
+        result = np.zeros(len(amounts))
+        for currency in np.unique(currencies):
+            mask = currencies == currency
+            result[mask] = (
+                amounts[mask]
+                * self._rates_at(currency, days[mask])
+                / self._rates_at(target, days[mask])
+            )
+        return result
+
+
+class RateTable:
+    """
+    Кэш таблицы курсов в памяти процесса
+
+    Таблица загружается из MongoDB целиком и перечитывается, только если
+    изменилась ее версия в Редис. Версия проверяется не чаще refresh_interval
+    секунд, увеличивает ее загрузка курсов
+    """
+
+    def __init__(
+        self,
+        collection: AsyncCollection,
+        redis_con: redis.Redis,
+        refresh_interval: float,
+    ):
+        self._collection = collection
+        self._redis = redis_con
+        self._refresh_interval = refresh_interval
+
+        self._rates = Rates({})
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+        self._reloads = registry.counter("rate_table_reloads_total")
+
+    async def get(self) -> Rates:
+        if time.monotonic() - self._checked_at < self._refresh_interval:
+            return self._rates
+
+        async with self._lock:
+            if time.monotonic() - self._checked_at >= self._refresh_interval:
+                version = int(await self._redis.get(RATES_VERSION_KEY) or 0)
+                if version != self._version:
+                    self._rates = await self._load()
+                    self._version = version
+                    self._reloads.inc()
+                self._checked_at = time.monotonic()
+
+        return self._rates
+
+    async def _load(self) -> Rates:
+        rows: dict[str, tuple[list[int], list[float]]] = {}
+        cursor = self._collection.find(
+            {}, {"_id": 0, "currency": 1, "date": 1, "rate": 1}
+        ).sort([("currency", ASCENDING), ("date", ASCENDING)])
+        async for doc in cursor:
+            days, rates = rows.setdefault(doc["currency"], ([], []))
+            days.append(doc["date"].toordinal())
+            rates.append(doc["rate"])
+
+        return Rates(
+            {
+                currency: (np.array(days, dtype=np.int64), np.array(rates))
+                for currency, (days, rates) in rows.items()
+            }
+        )
+
+
+def read_rates_file(path: Path) -> list[dict]:
+    """
+    Читает курсы из CSV с колонками date (YYYY-MM-DD), currency и rate
+    """
+    with path.open(newline="") as file:
+        return [
+            {
+                "date": datetime.combine(
+                    date.fromisoformat(row["date"]), datetime.min.time(), timezone.utc
+                ),
+                "currency": Currency(row["currency"]).value,
+                "rate": float(row["rate"]),
+            }
+            for row in csv.DictReader(file)
+        ]
+
+
+async def load_rates(
+    collection: AsyncCollection, redis_con: redis.Redis | None, rows: list[dict]
+):
+    """
+    Сохраняет курсы в MongoDB и увеличивает версию таблицы курсов
+    """
+    if rows:
+        await collection.bulk_write(
+            [
+                UpdateOne(
+                    {"currency": row["currency"], "date": row["date"]},
+                    {"$set": {"rate": row["rate"]}},
+                    upsert=True,
+                )
+                for row in rows
+            ],
+            ordered=False,
+        )
+
+    if redis_con is not None:
+        await redis_con.incr(RATES_VERSION_KEY)
+
+
+def convert_balance(
+    balance: Balance, rates: Rates, target: Currency, day: date
+) -> ConvertedBalance:
+    """
+    Переводит итоги по валютам в одну валюту по курсу на день day
+    """
+    currencies = np.array(list(balance.currencies), dtype=object)
+    days = np.full(len(currencies), day.toordinal(), dtype=np.int64)
+    income, expense = (
+        rates.convert(
+            np.array([getattr(item, field) for item in balance.currencies.values()]),
+            currencies,
+            days,
+            target,
+        ).sum()
+        for field in ("income", "expense")
+    )
+    return ConvertedBalance(
+        currency=target,
+        income=round(income, 2),
+        expense=round(expense, 2),
+        balance=round(income - expense, 2),
+    )
+
+
+def convert_dynamics(
+    dynamics: BudgetDynamics, rates: Rates, target: Currency
+) -> ConvertedDynamics:
+    """
+    Переводит ряды всех валют в одну валюту по курсу на начало каждого периода
+    и складывает их в один ряд
+    """
+    points = [
+        (currency, point)
+        for currency, series in dynamics.series.items()
+        for point in series
+    ]
+    currencies = np.array([currency for currency, _ in points], dtype=object)
+    starts = [point.start for _, point in points]
+    days = to_days(starts)
+
+    income = rates.convert(
+        np.array([point.income for _, point in points], dtype=np.float64),
+        currencies,
+        days,
+        target,
+    )
+    expense = rates.convert(
+        np.array([point.expense for _, point in points], dtype=np.float64),
+        currencies,
+        days,
+        target,
+    )
+
+    buckets, index = np.unique(days, return_inverse=True)
+    income = np.bincount(index, weights=income, minlength=len(buckets))
+    expense = np.bincount(index, weights=expense, minlength=len(buckets))
+    start_of = {day: start for day, start in zip(days.tolist(), starts)}
+
+    return ConvertedDynamics(
+        currency=target,
+        points=[
+            ConvertedPoint(
+                start=start_of[day],
+                income=round(bucket_income, 2),
+                expense=round(bucket_expense, 2),
+                net=round(bucket_income - bucket_expense, 2),
+            )
+            for day, bucket_income, bucket_expense in zip(
+                buckets.tolist(), income.tolist(), expense.tolist()
+            )
+        ],
+    )
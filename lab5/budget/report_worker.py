@@ -0,0 +1,82 @@
+"""
+Сервис отчетов: пул процессов, строящих отчеты из очереди в Редис
+
+Каждый процесс работает со своим event loop, пулом Редис и клиентом MongoDB.
+Количество процессов задается REPORT_WORKERS. Упавший процесс запускается
+заново с тем же номером и возвращает в очередь свои незавершенные задачи.
+Запуск: python report_worker.py
+"""
+
+import asyncio
+import multiprocessing
+import time
+from contextlib import suppress
+from multiprocessing.connection import wait
+
+import redis.asyncio as redis
+from dishka import make_async_container
+from pymongo.asynchronous.database import AsyncDatabase
+
+import config
+from ioc import providers
+from reports import process_reports
+
+RESTART_DELAY = 1.0
+
+
+async def serve(worker: int):
+    container = make_async_container(
+        providers.AppProvider(),
+        providers.RedisProvider(),
+        providers.MongoProvider(),
+        context={config.Settings: config.settings},
+    )
+    try:
+        redis_con = await container.get(redis.Redis, component="RedisProvider")
+        db = await container.get(AsyncDatabase, component="MongoProvider")
+        await process_reports(
+            redis_con,
+            db,
+            ttl=config.settings.report_ttl,
+            pop_timeout=config.settings.report_pop_timeout,
+            worker=worker,
+        )
+    finally:
+        await container.close()
+
+
+def run_process(worker: int):
+    with suppress(KeyboardInterrupt):
+        asyncio.run(serve(worker))
+
+
+def main():
+    context = multiprocessing.get_context("spawn")
+
+    def start(worker: int) -> multiprocessing.Process:
+        process = context.Process(
+            target=run_process, args=(worker,), name=f"report-worker-{worker}"
+        )
+        process.start()
+        return process
+
+    processes = {
+        worker: start(worker) for worker in range(config.settings.report_workers)
+    }
+    try:
+        while True:
+            wait([process.sentinel for process in processes.values()])
+            for worker, process in processes.items():
+                if process.is_alive():
+                    continue
+                print(f"{process.name} exited with code {process.exitcode}, restarting")
+                process.close()
+                time.sleep(RESTART_DELAY)
+                processes[worker] = start(worker)
+    finally:
+        for process in processes.values():
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import redis.asyncio as redis
+from pymongo.asynchronous.database import AsyncDatabase
+
+from db.models import BalanceItem, Report, ReportJob, ReportParams, ReportStatus
+from dynamics import get_dynamics
+from metrics import registry
+from versions import get_data_version
+
+REPORT_QUEUE_KEY = "reports:queue"
+REPORT_PROCESSING_KEY = "reports:processing:{worker}"
+
+_cache_hits = registry.counter("report_cache_hits_total")
+_cache_misses = registry.counter("report_cache_misses_total")
+
+
+def report_key(user_id: int, report_id: str) -> str:
+    return f"report:{user_id}:{report_id}"
+
+
+def report_cache_key(user_id: int, params: ReportParams) -> str:
+    digest = hashlib.sha1(params.model_dump_json().encode()).hexdigest()
+    return f"report:cache:{user_id}:{digest}"
+
+
+async def get_report(
+    redis_con: redis.Redis, user_id: int, report_id: str
+) -> ReportJob | None:
+    data = await redis_con.get(report_key(user_id, report_id))
+    if data is None:
+        return None
+    return ReportJob.model_validate_json(data)
+
+
+def is_reusable(job: ReportJob | None, job_timeout: int) -> bool:
+    if job is None or job.status == ReportStatus.FAILED:
+        return False
+    if job.status == ReportStatus.DONE:
+        return True
+    # Незавершенный отчет, который долго не менял состояние, мог потеряться
+    age = datetime.now(timezone.utc) - job.updated_at
+    return age < timedelta(seconds=job_timeout)
+
+
+async def submit_report(
+    redis_con: redis.Redis,
+    user_id: int,
+    params: ReportParams,
+    ttl: int,
+    job_timeout: int,
+) -> ReportJob:
+    """
+    Ставит отчет в очередь или возвращает уже построенный
+
+    Отчет с теми же параметрами переиспользуется, пока у пользователя
+    не появились новые записи (не изменилась версия данных). Отчет в очереди
+    или в работе переиспользуется не дольше job_timeout секунд с последнего
+    изменения состояния
+    """
+    version = await get_data_version(redis_con, user_id)
+    cache_key = report_cache_key(user_id, params)
+
+    cached = await redis_con.get(cache_key)
+    if cached is not None:
+        cached_version, report_id = cached.decode().split(":", 1)
+        if cached_version == version:
+            job = await get_report(redis_con, user_id, report_id)
+            if is_reusable(job, job_timeout):
+                _cache_hits.inc()
+                return job
+
+    _cache_misses.inc()
+    job = ReportJob(id=uuid4().hex, status=ReportStatus.QUEUED, params=params)
+    task = json.dumps({"user_id": user_id, "id": job.id})
+    async with redis_con.pipeline(transaction=True) as pipe:
+        pipe.set(report_key(user_id, job.id), job.model_dump_json(), ex=ttl)
+        pipe.set(cache_key, f"{version}:{job.id}", ex=ttl)
+        pipe.lpush(REPORT_QUEUE_KEY, task)
+        await pipe.execute()
+
+    return job
+
+
+async def compute_report(
+    db: AsyncDatabase, user_id: int, params: ReportParams
+) -> Report:
+    dynamics = await get_dynamics(
+        db, user_id, params.date_from, params.date_to, params.bucket
+    )
+
+    totals = {}
+    for currency, points in dynamics.series.items():
+        income = sum(point.income for point in points)
+        expense = sum(point.expense for point in points)
+        totals[currency] = BalanceItem(
+            income=income, expense=expense, balance=income - expense
+        )
+
+    return Report(totals=totals, dynamics=dynamics)
+
+
+async def requeue_processing(redis_con: redis.Redis, processing_key: str):
+    """
+    Возвращает в начало очереди задачи, которые взял и не завершил
+    предыдущий процесс с тем же номером
+    """
+    while await redis_con.lmove(processing_key, REPORT_QUEUE_KEY, "RIGHT", "RIGHT"):
+        pass
+
+
+async def process_reports(
+    redis_con: redis.Redis,
+    db: AsyncDatabase,
+    ttl: int,
+    pop_timeout: float,
+    worker: int,
+):
+    """
+    Забирает задачи из очереди и строит отчеты, пока не будет отменен
+
+    Задача атомарно переносится из очереди в список процесса
+    reports:processing:{worker} и удаляется из него только после сохранения
+    результата, поэтому задачи упавшего процесса не теряются: их возвращает
+    в очередь перезапущенный процесс с тем же номером. Любая ошибка построения
+    помечает отчет как failed, повторный запрос с теми же параметрами
+    поставит его в очередь заново
+    """
+    processing_key = REPORT_PROCESSING_KEY.format(worker=worker)
+    await requeue_processing(redis_con, processing_key)
+
+    while True:
+        item = await redis_con.blmove(
+            REPORT_QUEUE_KEY, processing_key, pop_timeout, "RIGHT", "LEFT"
+        )
+        if item is None:
+            continue
+
+        task = json.loads(item)
+        key = report_key(task["user_id"], task["id"])
+        job = await get_report(redis_con, task["user_id"], task["id"])
+        if job is None:
+            await redis_con.lrem(processing_key, 1, item)
+            continue
+
+        job.status = ReportStatus.RUNNING
+        job.updated_at = datetime.now(timezone.utc)
+        await redis_con.set(key, job.model_dump_json(), xx=True, keepttl=True)
+
+        try:
+            job.result = await compute_report(db, task["user_id"], job.params)
+            job.status = ReportStatus.DONE
+        except Exception as e:
+            job.status = ReportStatus.FAILED
+            job.error = str(e)
+        job.updated_at = datetime.now(timezone.utc)
+
+        async with redis_con.pipeline(transaction=True) as pipe:
+            pipe.set(key, job.model_dump_json(), ex=ttl)
+            pipe.lrem(processing_key, 1, item)
+            await pipe.execute()
@@ -0,0 +1,77 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable
+
+from pymongo import UpdateOne
+from pymongo.asynchronous.collection import AsyncCollection
+
+from db.models import Balance, BalanceItem, BudgetData, EntryKind
+
+TOTAL_PERIOD = "all"
+
+
+def month_of(date: datetime) -> str:
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc)
+    return f"{date.year:04}-{date.month:02}"
+
+
+def rollup_updates(
+    user_id: int, kind: EntryKind, entries: Iterable[BudgetData]
+) -> list[UpdateOne]:
+    """
+    Увеличения итогов пользователя за все время и за месяцы записей
+
+    Суммы записей одного месяца складываются заранее, поэтому на любое
+    количество записей приходится по одному обновлению на итог
+    """
+    increments: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for entry in entries:
+        field = f"{kind.value}.{entry.currency.value}"
+        increments[TOTAL_PERIOD][field] += entry.amount
+        increments[month_of(entry.date)][field] += entry.amount
+
+    return [
+        UpdateOne(
+            {"user_id": user_id, "period": period}, {"$inc": dict(inc)}, upsert=True
+        )
+        for period, inc in increments.items()
+    ]
+
+
+async def add_to_rollups(
+    rollups: AsyncCollection,
+    user_id: int,
+    kind: EntryKind,
+    entries: Iterable[BudgetData],
+):
+    """
+    Учитывает новые записи в итогах пользователя
+
+    Каждое увеличение атомарно, все итоги обновляются за один запрос к MongoDB.
+    Расхождения после сбоя между вставкой записи и обновлением итогов
+    находит и исправляет команда db.rebuild_rollups
+    """
+    await rollups.bulk_write(rollup_updates(user_id, kind, entries), ordered=False)
+
+
+def to_balance(period: str, doc: dict | None) -> Balance:
+    currencies: dict[str, BalanceItem] = {}
+    for kind in EntryKind:
+        for currency, amount in (doc or {}).get(kind.value, {}).items():
+            item = currencies.setdefault(currency, BalanceItem())
+            setattr(item, kind.value, amount)
+
+    for item in currencies.values():
+        item.balance = item.income - item.expense
+
+    return Balance(period=period, currencies=currencies)
+
+
+async def get_balance(rollups: AsyncCollection, user_id: int, period: str) -> Balance:
+    """
+    Возвращает доходы, расходы и баланс пользователя по валютам
+    за все время или за месяц в формате YYYY-MM
+    """
+    doc = await rollups.find_one({"user_id": user_id, "period": period})
+    return to_balance(period, doc)
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import redis.asyncio as redis
+
+from db.models import SessionUser
+from metrics import registry
+
+SESSION_REVOCATION_CHANNEL = "sessions:revoked"
+
+
+class SessionCache:
+    """
+    Кэш проверенных токенов в памяти процесса
+
+    Запись живет не дольше ttl секунд и не дольше самого токена. При переполнении
+    вытесняется давно не использованная запись. Отозванные токены удаляются
+    по идентификатору (jti) из канала отзыва
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._data: OrderedDict[str, tuple[float, SessionUser, str]] = OrderedDict()
+        self._tokens: dict[str, str] = {}
+        self._maxsize = maxsize
+        self._ttl = ttl
+
+        self._hits = registry.counter("session_cache_hits_total")
+        self._misses = registry.counter("session_cache_misses_total")
+        self._revoked = registry.counter("session_cache_revoked_total")
+        registry.callback("session_cache_size", lambda: len(self._data))
+
+    def get(self, token: str) -> SessionUser | None:
+        item = self._data.get(token)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self._drop(token)
+            self._misses.inc()
+            return None
+
+        self._data.move_to_end(token)
+        self._hits.inc()
+        return item[1]
+
+    def set(self, token: str, user: SessionUser, token_id: str, expires_at: float):
+        ttl = min(self._ttl, expires_at - time.time())
+        if ttl <= 0:
+            return
+
+        self._data[token] = (time.monotonic() + ttl, user, token_id)
+        self._data.move_to_end(token)
+        self._tokens[token_id] = token
+        if len(self._data) > self._maxsize:
+            self._drop(next(iter(self._data)))
+
+    def revoke(self, token_id: str):
+        token = self._tokens.pop(token_id, None)
+        if token is not None:
+            self._data.pop(token, None)
+            self._revoked.inc()
+
+    def _drop(self, token: str):
+        _, _, token_id = self._data.pop(token)
+        self._tokens.pop(token_id, None)
+
+    def clear(self):
+        self._data.clear()
+        self._tokens.clear()
+
+
+async def listen_revocations(redis_con: redis.Redis, cache: SessionCache):
+    """
+    Удаляет из кэша токены, отозванные сервисом авторизации
+
+    Сообщения pub/sub не гарантируют доставку, поэтому после переподключения
+    кэш очищается целиком
+    """
+
+    while True:
+        try:
+            async with redis_con.pubsub() as pubsub:
+                await pubsub.subscribe(SESSION_REVOCATION_CHANNEL)
+                cache.clear()
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        cache.revoke(message["data"].decode())
+        except redis.RedisError:
+            cache.clear()
+            await asyncio.sleep(1)
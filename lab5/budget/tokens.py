@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import httpx
+import jwt
+import redis.asyncio as redis
+from jwt.exceptions import InvalidTokenError
+
+from db.models import SessionUser
+from metrics import registry
+
+ALGORITHM = "EdDSA"
+JWKS_MIN_REFRESH_INTERVAL = 10.0
+
+
+class TokenVerifier:
+    """
+    Проверяет токены сервиса авторизации локально по открытым ключам из JWKS
+
+    Набор ключей кэшируется на jwks_ttl секунд и перезапрашивается раньше,
+    если встретился неизвестный ключ. Если сервис авторизации недоступен,
+    используются ранее полученные ключи. Список отозванных токенов в Редис
+    проверяется только при check_revocation, при недоступности Редис
+    токен считается действующим
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        jwks_ttl: float,
+        redis_con: redis.Redis,
+        check_revocation: bool,
+    ):
+        self._jwks_url = jwks_url
+        self._jwks_ttl = jwks_ttl
+        self._redis = redis_con
+        self._check_revocation = check_revocation
+
+        self._client = httpx.AsyncClient(timeout=5.0)
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._fetched_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+
+        self._jwks_errors = registry.counter("jwks_refresh_errors_total")
+        self._revocation_errors = registry.counter("revocation_check_errors_total")
+
+    async def _refresh(self):
+        async with self._refresh_lock:
+            if time.monotonic() - self._fetched_at < JWKS_MIN_REFRESH_INTERVAL:
+                return
+
+            try:
+                response = await self._client.get(self._jwks_url)
+                response.raise_for_status()
+                key_set = jwt.PyJWKSet.from_dict(response.json())
+            except (httpx.HTTPError, jwt.PyJWKSetError):
+                self._jwks_errors.inc()
+                if not self._keys:
+                    raise InvalidTokenError("Signing keys are unavailable")
+                return
+            finally:
+                self._fetched_at = time.monotonic()
+
+            self._keys = {key.key_id: key for key in key_set.keys}
+
+    async def _get_key(self, kid: str) -> jwt.PyJWK:
+        stale = time.monotonic() - self._fetched_at > self._jwks_ttl
+        if stale or kid not in self._keys:
+            await self._refresh()
+
+        key = self._keys.get(kid)
+        if key is None:
+            raise InvalidTokenError("Unknown key id")
+        return key
+
+    async def _is_revoked(self, token_id: str) -> bool:
+        try:
+            return bool(await self._redis.exists(f"revoked:{token_id}"))
+        except redis.RedisError:
+            self._revocation_errors.inc()
+            return False
+
+    async def verify(self, token: str) -> tuple[SessionUser, dict]:
+        """
+        Возвращает пользователя и содержимое токена,
+        при недействительном токене выбрасывает InvalidTokenError
+        """
+        key = await self._get_key(jwt.get_unverified_header(token).get("kid"))
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=[ALGORITHM],
+            options={"require": ["exp", "sub", "user_id", "jti"]},
+        )
+
+        if self._check_revocation and await self._is_revoked(claims["jti"]):
+            raise InvalidTokenError("Token is revoked")
+
+        user = SessionUser(
+            username=claims["sub"],
+            is_admin=claims.get("is_admin", False),
+            user_id=claims["user_id"],
+        )
+        return user, claims
+
+    async def close(self):
+        await self._client.aclose()
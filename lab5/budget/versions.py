@@ -0,0 +1,46 @@
+import secrets
+
+import redis.asyncio as redis
+
+# Версия данных хранится как "счетчик.эпоха". Эпоха - случайная метка, которая
+# выбирается заново при каждом изменении и при появлении ключа. Если ключ
+# вытеснен или Редис восстановлен из старого снимка, счетчик может повториться,
+# а версия целиком - нет, поэтому старые ETag и страницы к ней не подходят
+_GET_SCRIPT = """
+local version = redis.call('GET', KEYS[1])
+if not version then
+    version = '0.' .. ARGV[1]
+    redis.call('SET', KEYS[1], version)
+end
+return version
+"""
+
+_BUMP_SCRIPT = """
+local counter = tonumber(string.match(redis.call('GET', KEYS[1]) or '', '^%d+')) or 0
+local version = (counter + 1) .. '.' .. ARGV[1]
+redis.call('SET', KEYS[1], version)
+return version
+"""
+
+
+def data_version_key(user_id: int) -> str:
+    return f"budget:version:{user_id}"
+
+
+def new_epoch() -> str:
+    return secrets.token_hex(4)
+
+
+async def get_data_version(redis_con: redis.Redis, user_id: int) -> str:
+    """
+    Версия данных пользователя, меняется при каждом добавлении записей
+    """
+    get_version = redis_con.register_script(_GET_SCRIPT)
+    version = await get_version(keys=[data_version_key(user_id)], args=[new_epoch()])
+    return version.decode()
+
+
+async def bump_data_version(redis_con: redis.Redis, user_id: int) -> str:
+    bump_version = redis_con.register_script(_BUMP_SCRIPT)
+    version = await bump_version(keys=[data_version_key(user_id)], args=[new_epoch()])
+    return version.decode()
@@ -2,10 +2,17 @@ CREATE TABLE IF NOT EXISTS budget_users (
     id SERIAL PRIMARY KEY,
     username VARCHAR(100) UNIQUE NOT NULL,
     password TEXT NOT NULL,
-    is_admin BOOLEAN
+    is_admin BOOLEAN,
+    first_name VARCHAR(100),
+    last_name VARCHAR(100)
 );
 
-CREATE INDEX IF NOT EXISTS idx_budget_users_username ON budget_users(username);
+CREATE INDEX IF NOT EXISTS idx_budget_users_username ON budget_users(username COLLATE "C");
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_budget_users_first_name ON budget_users USING GIN (first_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_budget_users_last_name ON budget_users USING GIN (last_name gin_trgm_ops);
 
 INSERT INTO budget_users (username, password, is_admin) VALUES
 ('admin', '$2b$12$3YCS.oOBXTSvDItFYqUEDOYej3NYc1YncreQjHtNZeS1vt9U6d5na', TRUE),
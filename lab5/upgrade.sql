@@ -0,0 +1,17 @@
+-- Обновление схемы существующей БД до init.sql: init.sql выполняется только
+-- на пустом томе ./data/postgres. Скрипт можно запускать повторно
+-- docker exec -i postgres psql -U admin budgeting < upgrade.sql
+
+ALTER TABLE budget_users ADD COLUMN IF NOT EXISTS first_name VARCHAR(100);
+ALTER TABLE budget_users ADD COLUMN IF NOT EXISTS last_name VARCHAR(100);
+
+-- Индекс логинов пересоздается с COLLATE "C": новый строится рядом
+-- со старым без блокировки таблицы и затем занимает его имя
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_budget_users_username_c ON budget_users(username COLLATE "C");
+DROP INDEX CONCURRENTLY IF EXISTS idx_budget_users_username;
+ALTER INDEX idx_budget_users_username_c RENAME TO idx_budget_users_username;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_budget_users_first_name ON budget_users USING GIN (first_name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_budget_users_last_name ON budget_users USING GIN (last_name gin_trgm_ops);